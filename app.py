@@ -1,314 +1,451 @@
-from flask import Flask, render_template, request, send_file
-import pandas as pd
+from flask import Flask, Response, g, jsonify, render_template, request, send_file, stream_with_context
 from datetime import datetime
+import itertools
+import json
+import logging
 import os
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from carbon_calculator import (
-    calcular_emissao, 
-    calcular_fator_idade, 
-    calcular_intensidade
-)
-
-# Tenta importar configuração do Google Maps API
-# Em produção, usa variável de ambiente; em desenvolvimento, usa config.py
-import os
-try:
-    from config import GOOGLE_MAPS_API_KEY
+import threading
+import time
+from functools import lru_cache
+# Apenas módulos leves são importados aqui. pandas (carbon_calculator, armazem) e ReportLab
+# (estilos de relatorio_pdf) são carregados na primeira rota que precisar deles, ou antecipadamente
+# por 'aquecer' (PRE_CARREGAR=1, para uso com 'gunicorn --preload').
+from cache_lru import CacheLRU
+from distancias import obter_resolvedor
+from fatores import calcular_viagem, obter_registro
+from metricas import cronometrar, registro_metricas
+from relatorio_pdf import FilaRelatoriosCheia, abrir_relatorio, solicitar_relatorio, status_relatorio
+
+@lru_cache(maxsize=None)
+def obter_google_maps_key():
+    """
+    Lê a API key do Google Maps na primeira renderização de template.
+    Em produção, usa variável de ambiente; em desenvolvimento, usa config.py
+    """
+    try:
+        from config import GOOGLE_MAPS_API_KEY
+    except ImportError:
+        # Se não houver config.py, usa variável de ambiente
+        return os.getenv('GOOGLE_MAPS_API_KEY', 'YOUR_API_KEY')
     # Se estiver vazio, tenta variável de ambiente
     if GOOGLE_MAPS_API_KEY == 'YOUR_API_KEY':
-        GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY', 'YOUR_API_KEY')
-except ImportError:
-    # Se não houver config.py, usa variável de ambiente
-    GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY', 'YOUR_API_KEY')
+        return os.getenv('GOOGLE_MAPS_API_KEY', 'YOUR_API_KEY')
+    return GOOGLE_MAPS_API_KEY
 
 app = Flask(__name__)
 
+# Linhas processadas por bloco no envio em lote (/calcular-lote)
+TAMANHO_LOTE_UPLOAD = int(os.getenv('TAMANHO_LOTE_UPLOAD', '20000'))
+# Início da última linha do CSV quando um bloco falha depois que a resposta já começou
+MARCADOR_ERRO_CSV = '#ERRO'
 
+# Envios em lote processados ao mesmo tempo por worker. O cálculo em pandas disputa a CPU (e o GIL)
+# com as demais requisições; acima do limite, /calcular-lote responde 503 com Retry-After.
+LOTES_SIMULTANEOS = int(os.getenv('LOTES_SIMULTANEOS', '2'))
+_vagas_lotes = threading.BoundedSemaphore(LOTES_SIMULTANEOS)
+
+# Cache dos resultados de /calcular, indexado pelas entradas normalizadas e pela versão dos fatores
+cache_calculos = CacheLRU(max_itens=int(os.getenv('CACHE_CALCULOS_TAMANHO', '1024')))
+
+# Banco SQLite com as viagens calculadas consultadas pela API /api/emissoes (ver armazem.py)
+CAMINHO_ARMAZEM = os.getenv('ARMAZEM_DB', 'carbon_log.db')
+
+# Com METRICAS_LOG=1, cada requisição gera uma linha JSON (rota, status, duração e tempo por etapa)
+METRICAS_LOG = os.getenv('METRICAS_LOG', '').lower() in ('1', 'true', 'sim')
+log_requisicoes = logging.getLogger('carbonlog.requisicoes')
+if METRICAS_LOG:
+    # Nem o Flask nem o gunicorn configuram o logger raiz (nível efetivo WARNING, sem handler):
+    # o logger das requisições escreve diretamente na saída de erro, no nível INFO
+    log_requisicoes.setLevel(logging.INFO)
+    if not log_requisicoes.handlers:
+        log_requisicoes.addHandler(logging.StreamHandler())
+    log_requisicoes.propagate = False
+
+requisicoes_total = registro_metricas.contador(
+    'carbonlog_requisicoes_total', 'Requisições atendidas, por rota, método e status',
+    rotulos=('rota', 'metodo', 'status'))
+tempo_requisicoes = registro_metricas.histograma(
+    'carbonlog_requisicao_segundos', 'Tempo de atendimento das requisições, por rota', rotulos=('rota',))
 
 
-def gerar_relatorio_pdf(dados: dict, caminho_arquivo: str) -> None:
-    """Gera um relatório PDF simples e auditável com base nos dados calculados."""
-    doc = SimpleDocTemplate(caminho_arquivo, pagesize=A4, title="Relatório de Emissões - Carbon Log")
-    styles = getSampleStyleSheet()
 
-    titulo = ParagraphStyle(
-        "Titulo",
-        parent=styles["Heading1"],
-        fontSize=16,
-        leading=20,
-        spaceAfter=8,
-    )
-    subtitulo = ParagraphStyle(
-        "Subtitulo",
-        parent=styles["Normal"],
-        fontSize=9,
-        textColor=colors.HexColor("#5a6d67"),
-        spaceAfter=12,
-    )
-    secao_titulo = ParagraphStyle(
-        "SecaoTitulo",
-        parent=styles["Heading2"],
-        fontSize=11,
-        textTransform="uppercase",
-        textColor=colors.HexColor("#0d5c4a"),
-        leading=14,
-        spaceAfter=6,
-    )
-    corpo = styles["Normal"]
-    corpo.spaceAfter = 6
-
-    story = []
-    story.append(Paragraph("Relatório de Emissões de GEE", titulo))
-    story.append(Paragraph(f"Carbon Log — {dados.get('data_relatorio', '')}", subtitulo))
-    story.append(Paragraph(f"Emissão total da viagem: <b>{dados.get('emissao_final', '')} tCO2e</b>", corpo))
-    story.append(Paragraph(f"Modo de cálculo: {dados.get('modo_calculo_label', '')} ({dados.get('modo_calculo_selo', '')})", corpo))
-    story.append(Spacer(1, 12))
-
-    # Dados da viagem
-    story.append(Paragraph("Dados da viagem", secao_titulo))
-    dados_viagem = [
-        ["Tipo de veículo", dados.get("tipo_veiculo")],
-        ["Combustível", dados.get("tipo_combustivel")],
-        ["Modo de cálculo", dados.get("modo_calculo_label")],
-        ["Litros consumidos", f"{dados.get('litros', '')} L ({dados.get('litros_texto_origem', '')})"],
-    ]
-    if dados.get("km_rodado") and float(dados.get("km_rodado", 0)) > 0:
-        dados_viagem.append(["Quilômetros rodados", f"{dados.get('km_rodado', '')} km"])
-    if dados.get("km_por_litro"):
-        dados_viagem.append(["Consumo do veículo", f"{dados.get('km_por_litro', '')} km/L"])
-    if dados.get("tipo_veiculo_raw") == "caminhao":
-        dados_viagem.append(["Carga transportada (t)", dados.get("carga_ton")])
-
-    tabela_viagem = Table(dados_viagem, colWidths=[180, 330])
-    tabela_viagem.setStyle(
-        TableStyle(
-            [
-                ("BACKGROUND", (0, 0), (1, 0), colors.HexColor("#f0f7f5")),
-                ("TEXTCOLOR", (0, 0), (1, 0), colors.HexColor("#1a2e28")),
-                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                ("ALIGN", (0, 0), (0, -1), "LEFT"),
-                ("ALIGN", (1, 0), (1, -1), "LEFT"),
-                ("INNERGRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#d4e5e1")),
-                ("BOX", (0, 0), (-1, -1), 0.25, colors.HexColor("#d4e5e1")),
-                ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-            ]
-        )
-    )
-    story.append(tabela_viagem)
-    story.append(Spacer(1, 12))
-
-    # Resultados
-    story.append(Paragraph("Resultados do cálculo", secao_titulo))
-    dados_resultados = [
-        ["Emissão total (tCO2e)", dados.get("emissao_final")],
-    ]
-    if dados.get("intensidade_km") and float(dados.get("intensidade_km", 0)) > 0:
-        dados_resultados.append(["Emissão por km (tCO2e/km)", dados.get("intensidade_km")])
-    if dados.get("eficiencia") and float(dados.get("eficiencia", 0)) > 0:
-        dados_resultados.append(["Eficiência (km/L)", dados.get("eficiencia")])
-    if dados.get("tipo_veiculo_raw") == "caminhao":
-        dados_resultados.append(["Intensidade por tonelada (tCO2e/ton)", dados.get("intensidade_ton")])
-
-    tabela_resultados = Table(dados_resultados, colWidths=[220, 290])
-    tabela_resultados.setStyle(
-        TableStyle(
-            [
-                ("BACKGROUND", (0, 0), (1, 0), colors.HexColor("#f0f7f5")),
-                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                ("INNERGRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#d4e5e1")),
-                ("BOX", (0, 0), (-1, -1), 0.25, colors.HexColor("#d4e5e1")),
-            ]
-        )
-    )
-    story.append(tabela_resultados)
-    story.append(Spacer(1, 12))
-
-    # Comparação com média do setor
-    story.append(Paragraph("Comparação com média do setor", secao_titulo))
-    comp_texto = ""
-    situacao = dados.get("comparacao_setor_situacao")
-    perc = dados.get("comparacao_setor_percentual")
-    media_setor = dados.get("media_setor_intensidade_km")
-    if situacao == "indisponível":
-        comp_texto = "Não foi possível comparar com a média de referência (km ou emissões zeradas)."
-    else:
-        comp_texto = (
-            f"Resultado de aproximadamente {perc}% {situacao} da média de referência "
-            f"({media_setor} tCO2e/km)."
-        )
-    story.append(Paragraph(comp_texto, corpo))
-    story.append(Spacer(1, 12))
-
-    # Nota ESG / GHG Protocol
-    story.append(
-        Paragraph(
-            "Empresas que precisam reportar emissões ao GHG Protocol ou clientes ESG exigentes "
-            "utilizam relatórios auditáveis.",
-            corpo,
-        )
-    )
 
-    doc.build(story)
+@app.before_request
+def _iniciar_medicao():
+    g.inicio_requisicao = time.perf_counter()
+    g.etapas = {}
 
+def _registrar_requisicao(status):
+    """
+    Registra a duração e o status da requisição, uma única vez. Em respostas em streaming
+    (/calcular-lote) a duração cobre apenas até o início do envio do corpo.
+    """
+    g.requisicao_registrada = True
+    duracao = time.perf_counter() - g.get('inicio_requisicao', time.perf_counter())
+    rota = request.url_rule.rule if request.url_rule is not None else 'desconhecida'
+    requisicoes_total.incrementar(rota, request.method, str(status))
+    tempo_requisicoes.observar(duracao, rota)
+    if METRICAS_LOG:
+        log_requisicoes.info(json.dumps({
+            'rota': rota,
+            'metodo': request.method,
+            'status': status,
+            'duracao_ms': round(duracao * 1000, 3),
+            'etapas_ms': {etapa: round(segundos * 1000, 3) for etapa, segundos in g.get('etapas', {}).items()},
+        }, ensure_ascii=False))
+
+@app.after_request
+def _registrar_medicao(resposta):
+    _registrar_requisicao(resposta.status_code)
+    return resposta
+
+@app.teardown_request
+def _registrar_erro_nao_tratado(exc):
+    """
+    Conta como 500 as exceções que escapam da view sem passar por 'after_request' (por exemplo,
+    com PROPAGATE_EXCEPTIONS ou em modo debug, quando o Flask as repassa ao servidor).
+    """
+    if exc is not None and not g.get('requisicao_registrada', False):
+        _registrar_requisicao(500)
 
 @app.context_processor
 def inject_google_maps_key():
     """Injeta a API key do Google Maps em todos os templates"""
-    return dict(google_maps_api_key=GOOGLE_MAPS_API_KEY)
+    return dict(google_maps_api_key=obter_google_maps_key())
 
 @app.route('/')
 def home():
     return render_template('index.html', ano_atual=datetime.now().year)
 
+def _calcular_resultado(tipo_veiculo, tipo_combustivel, modo_calculo, litros, km_rodado, km_por_litro,
+                        carga_ton, litros_estimado, registro):
+    """
+    Calcula a viagem e monta os campos do resultado que dependem apenas das entradas do cálculo
+    (sem e-mail, endereços ou data), para que possam ser reaproveitados pelo cache.
+    """
+    # Calcula emissão base, fator de idade, emissão final, intensidades e eficiência
+    # pelo caminho escalar (mesmos fatores e blocos do cálculo em lote, sem DataFrame).
+    # Ano de fabricação não é coletado no formulário: usa o ano de referência → fator_idade = 1.0
+    resultado = calcular_viagem(
+        litros,
+        tipo_combustivel,
+        km_rodado=km_rodado,
+        carga_ton=carga_ton,
+        registro=registro,
+    )
+    
+    # Prepara os rótulos para exibição
+    tipo_veiculo_label = 'Caminhão' if tipo_veiculo == 'caminhao' else 'Carro'
+    modo_calculo_label = 'Modo preciso' if modo_calculo == 'preciso' else 'Modo estimado'
+    modo_calculo_selo = 'Alta precisão' if modo_calculo == 'preciso' else 'Resultado estimado'
+    if litros_estimado:
+        litros_texto_origem = f'estimados ({km_por_litro:.1f} km/L · {km_rodado:.0f} km)'
+    else:
+        litros_texto_origem = 'informados pelo usuário'
+
+    # Comparação com média de intensidade do setor (valor fixo simulado)
+    media_setor_intensidade_km = 0.0008  # tCO2e/km (valor de referência fixo)
+    intensidade_km_valor = float(resultado['Intensidade_tCO2e_por_KM'])
+    if km_rodado > 0 and intensidade_km_valor > 0 and media_setor_intensidade_km > 0:
+        diff_percent = (intensidade_km_valor - media_setor_intensidade_km) / media_setor_intensidade_km * 100
+        if diff_percent > 5:
+            situacao_setor = 'acima'
+        elif diff_percent < -5:
+            situacao_setor = 'abaixo'
+        else:
+            situacao_setor = 'na faixa da'
+        diff_percent_formatado = f"{abs(diff_percent):.1f}"
+    else:
+        situacao_setor = 'indisponível'
+        diff_percent_formatado = None
+
+    return {
+        'modo_calculo': modo_calculo,
+        'modo_calculo_label': modo_calculo_label,
+        'modo_calculo_selo': modo_calculo_selo,
+        'litros_estimado': litros_estimado,
+        'litros_texto_origem': litros_texto_origem,
+        'tipo_veiculo': tipo_veiculo_label,
+        'tipo_veiculo_raw': tipo_veiculo,
+        'tipo_combustivel': tipo_combustivel,
+        'litros': f"{litros:.2f}",
+        'km_por_litro': f"{km_por_litro:.1f}" if km_por_litro > 0 else '',
+        'km_rodado': f"{km_rodado:.2f}",
+        'carga_ton': f"{carga_ton:.2f}",
+        'emissao_base': f"{resultado['emissao_base']:.4f}",
+        'fator_idade': f"{resultado['Fator_idade']:.4f}",
+        'emissao_final': f"{resultado['emissao_final']:.4f}",
+        'intensidade_ton': f"{resultado['Intensidade_tCO2e_por_Ton']:.6f}",
+        'intensidade_km': f"{resultado['Intensidade_tCO2e_por_KM']:.6f}",
+        'eficiencia': f"{resultado['Eficiencia_KM_por_L']:.2f}",
+        'media_setor_intensidade_km': f"{media_setor_intensidade_km:.6f}",
+        'comparacao_setor_percentual': diff_percent_formatado,
+        'comparacao_setor_situacao': situacao_setor,
+    }
+
 @app.route('/calcular', methods=['POST'])
 def calcular():
     try:
         # 1. Captura todos os dados do formulário
-        email = request.form['email']
-        tipo_veiculo = request.form.get('tipo_veiculo', 'carro')
-        tipo_combustivel = request.form['tipo_combustivel']
-        modo_calculo = request.form.get('modo_calculo', 'estimado')
-        # Ano de fabricação não é coletado no formulário: usa ano atual → fator_idade = 1.0
-        ano_fabricacao = datetime.now().year
-        carga_ton = float(request.form.get('carga_ton', 0) or 0)
-
-        # Define litros e km conforme o modo de cálculo
-        km_por_litro = 0.0
-        litros_estimado = False
-        if modo_calculo == 'preciso':
-            # Modo preciso: usuário informa os litros diretamente; km não é coletado
-            litros = float(request.form['litros'])
-            km_rodado = 0.0
-        else:
-            # Modo estimado: usuário informa km rodados e consumo do veículo (km/L)
-            km_rodado = float(request.form.get('km_rodado', 0) or 0)
-            km_por_litro = float(request.form.get('km_por_litro', 0) or 0)
-            if km_rodado <= 0 or km_por_litro <= 0:
-                litros = 0.0
+        with cronometrar('calcular', 'formulario', g.etapas):
+            email = request.form['email']
+            tipo_veiculo = request.form.get('tipo_veiculo', 'carro')
+            tipo_combustivel = request.form['tipo_combustivel']
+            modo_calculo = request.form.get('modo_calculo', 'estimado')
+            carga_ton = float(request.form.get('carga_ton', 0) or 0)
+
+            # Dados de localização (opcionais)
+            endereco_origem = request.form.get('endereco_origem', '')
+            endereco_destino = request.form.get('endereco_destino', '')
+            lat_origem = request.form.get('lat_origem', '')
+            lng_origem = request.form.get('lng_origem', '')
+            lat_destino = request.form.get('lat_destino', '')
+            lng_destino = request.form.get('lng_destino', '')
+
+            # Define litros e km conforme o modo de cálculo
+            km_por_litro = 0.0
+            litros_estimado = False
+            if modo_calculo == 'preciso':
+                # Modo preciso: usuário informa os litros diretamente; km não é coletado
+                litros = float(request.form['litros'])
+                km_rodado = 0.0
             else:
-                litros = km_rodado / km_por_litro
-            litros_estimado = True
-        
-        # Dados de localização (opcionais)
-        endereco_origem = request.form.get('endereco_origem', '')
-        endereco_destino = request.form.get('endereco_destino', '')
-        lat_origem = request.form.get('lat_origem', '')
-        lng_origem = request.form.get('lng_origem', '')
-        lat_destino = request.form.get('lat_destino', '')
-        lng_destino = request.form.get('lng_destino', '')
-        
-        # 2. Cria um DataFrame temporário com os dados do formulário
-        # Isso permite usar as funções avançadas que esperam DataFrame
-        dados_viagem = pd.DataFrame({
-            'ID_Viagem': ['WEB_001'],
-            'Data': [datetime.now().strftime('%Y-%m-%d')],
-            'Frota_ID': ['WEB'],
-            'Combustivel_L': [litros],
-            'Tipo_Combustivel': [tipo_combustivel],
-            'KM_Rodado': [km_rodado],
-            'Carga_Ton': [carga_ton],
-            'Numero_Eixos': [0],  # Não usado no cálculo, mas necessário para compatibilidade
-            'Ano_Fabricacao': [ano_fabricacao]
-        })
+                # Modo estimado: usuário informa km rodados e consumo do veículo (km/L)
+                km_rodado = float(request.form.get('km_rodado', 0) or 0)
+                km_por_litro = float(request.form.get('km_por_litro', 0) or 0)
+                if km_rodado <= 0 and all((lat_origem, lng_origem, lat_destino, lng_destino)):
+                    # Sem distância do navegador: resolve a rota no servidor a partir das coordenadas
+                    with cronometrar('calcular', 'distancia', g.etapas):
+                        km_rodado = round(obter_resolvedor().distancia(
+                            float(lat_origem), float(lng_origem), float(lat_destino), float(lng_destino)), 1)
+                if km_rodado <= 0 or km_por_litro <= 0:
+                    litros = 0.0
+                else:
+                    litros = km_rodado / km_por_litro
+                litros_estimado = True
         
-        # 3. Processa usando todas as funções avançadas
+        # 2. Calcula o resultado, reaproveitando-o do cache quando as mesmas entradas já foram
+        # calculadas com a mesma versão dos fatores e o mesmo ano de referência
+        with cronometrar('calcular', 'calculo', g.etapas):
+            registro = obter_registro()
+            chave_cache = (tipo_veiculo, tipo_combustivel, modo_calculo, litros, km_rodado, km_por_litro,
+                           carga_ton, registro.chave)
+            resultado = cache_calculos.obter(chave_cache)
+            if resultado is None:
+                resultado = _calcular_resultado(tipo_veiculo, tipo_combustivel, modo_calculo, litros, km_rodado,
+                                                km_por_litro, carga_ton, litros_estimado, registro)
+                cache_calculos.definir(chave_cache, resultado)
         
-        # 3.1. Calcula emissão base
-        dados_com_emissao = calcular_emissao(dados_viagem)
-        
-        # 3.2. Calcula fator de idade e emissão final
-        dados_com_idade = calcular_fator_idade(dados_com_emissao)
-        
-        # 3.3. Calcula intensidades e eficiência
-        dados_final = calcular_intensidade(dados_com_idade)
-        
-        # 4. Extrai os resultados para exibição
-        resultado = dados_final.iloc[0]  # Primeira (e única) linha
-        tipo_veiculo_label = 'Caminhão' if tipo_veiculo == 'caminhao' else 'Carro'
-        modo_calculo_label = 'Modo preciso' if modo_calculo == 'preciso' else 'Modo estimado'
-        modo_calculo_selo = 'Alta precisão' if modo_calculo == 'preciso' else 'Resultado estimado'
-        if litros_estimado:
-            litros_texto_origem = f'estimados ({km_por_litro:.1f} km/L · {km_rodado:.0f} km)'
-        else:
-            litros_texto_origem = 'informados pelo usuário'
-
-        # Comparação com média de intensidade do setor (valor fixo simulado)
-        media_setor_intensidade_km = 0.0008  # tCO2e/km (valor de referência fixo)
-        intensidade_km_valor = float(resultado['Intensidade_tCO2e_por_KM'])
-        if km_rodado > 0 and intensidade_km_valor > 0 and media_setor_intensidade_km > 0:
-            diff_percent = (intensidade_km_valor - media_setor_intensidade_km) / media_setor_intensidade_km * 100
-            if diff_percent > 5:
-                situacao_setor = 'acima'
-            elif diff_percent < -5:
-                situacao_setor = 'abaixo'
-            else:
-                situacao_setor = 'na faixa da'
-            diff_percent_formatado = f"{abs(diff_percent):.1f}"
-        else:
-            situacao_setor = 'indisponível'
-            diff_percent_formatado = None
-        
-        # 5. Gera nome e caminho do relatório PDF (relatório auditável)
+        # 3. Prepara dados para o template (campos do resultado + dados desta submissão)
         agora = datetime.now()
-        nome_arquivo = f"Relatorio_Carbono_Individual_{agora.strftime('%Y%m%d_%H%M%S')}.pdf"
-        caminho_arquivo = os.path.join(os.getcwd(), nome_arquivo)
-        
-        # 6. Prepara dados para o template
-        data_relatorio = agora.strftime('%d/%m/%Y às %H:%M')
         dados_template = {
-            'data_relatorio': data_relatorio,
-            'modo_calculo': modo_calculo,
-            'modo_calculo_label': modo_calculo_label,
-            'modo_calculo_selo': modo_calculo_selo,
-            'litros_estimado': litros_estimado,
-            'litros_texto_origem': litros_texto_origem,
+            **resultado,
+            'data_relatorio': agora.strftime('%d/%m/%Y às %H:%M'),
             'email': email,
-            'tipo_veiculo': tipo_veiculo_label,
-            'tipo_veiculo_raw': tipo_veiculo,
-            'tipo_combustivel': tipo_combustivel,
-            'litros': f"{litros:.2f}",
-            'km_por_litro': f"{km_por_litro:.1f}" if km_por_litro > 0 else '',
-            'km_rodado': f"{km_rodado:.2f}",
-            'carga_ton': f"{carga_ton:.2f}",
             'endereco_origem': endereco_origem if endereco_origem else 'Não informado',
             'endereco_destino': endereco_destino if endereco_destino else 'Não informado',
-            'emissao_base': f"{resultado['emissao_base']:.4f}",
-            'fator_idade': f"{resultado['Fator_idade']:.4f}",
-            'emissao_final': f"{resultado['emissao_final']:.4f}",
-            'intensidade_ton': f"{resultado['Intensidade_tCO2e_por_Ton']:.6f}",
-            'intensidade_km': f"{resultado['Intensidade_tCO2e_por_KM']:.6f}",
-            'eficiencia': f"{resultado['Eficiencia_KM_por_L']:.2f}",
-            'media_setor_intensidade_km': f"{media_setor_intensidade_km:.6f}",
-            'comparacao_setor_percentual': diff_percent_formatado,
-            'comparacao_setor_situacao': situacao_setor,
-            'arquivo_relatorio': f"/download/{nome_arquivo}"
         }
 
-        # 7. Gera o PDF baseado nesses dados
-        gerar_relatorio_pdf(dados_template, caminho_arquivo)
+        # 4. Agenda a geração do PDF (relatório auditável) em segundo plano.
+        # O nome do arquivo deriva do conteúdo: entradas idênticas reaproveitam o PDF já gerado.
+        with cronometrar('calcular', 'agendamento_pdf', g.etapas):
+            try:
+                nome_arquivo = solicitar_relatorio(dados_template)
+                dados_template['arquivo_relatorio'] = f"/download/{nome_arquivo}"
+            except FilaRelatoriosCheia as e:
+                # Sob pico de relatórios a página sai sem o link do PDF, em vez de esperar a fila
+                app.logger.warning('Relatório PDF não agendado: %s', e)
         
-        # 8. Renderiza a página de resultado
-        return render_template('resultado.html', **dados_template)
+        # 5. Renderiza a página de resultado
+        with cronometrar('calcular', 'template', g.etapas):
+            return render_template('resultado.html', **dados_template)
         
-    except Exception as e:
-        # Tratamento de erro
+    except (KeyError, ValueError) as e:
+        # Formulário incompleto ou com valores inválidos
         error_message = f"Erro ao processar o cálculo: {str(e)}"
         return f"<h1>Erro</h1><p>{error_message}</p><a href='/'>Voltar</a>", 400
+    except Exception:
+        # Falha interna: registra o traceback em vez de devolvê-la como erro de entrada
+        app.logger.exception('Falha inesperada em /calcular')
+        return "<h1>Erro</h1><p>Erro interno ao processar o cálculo.</p><a href='/'>Voltar</a>", 500
+
+@app.route('/cache/estatisticas')
+def estatisticas_cache():
+    """Contadores de acertos/falhas dos caches de cálculos e de distâncias, para dimensioná-los."""
+    return jsonify(calculos=cache_calculos.estatisticas(), distancias=obter_resolvedor().cache.estatisticas())
+
+@app.route('/metrics')
+def metricas():
+    """Contadores e histogramas de tempo por etapa no formato de texto do Prometheus."""
+    return Response(registro_metricas.exportar_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/calcular-lote', methods=['POST'])
+def calcular_lote():
+    """
+    Processa um CSV de viagens (esquema de 'dados_exemplo.csv') enviado no campo 'arquivo'.
+    Viagens com coordenadas (lat_origem, lng_origem, lat_destino, lng_destino) e sem KM_Rodado
+    têm a distância resolvida no servidor.
+
+    O arquivo é lido em blocos e cada bloco é devolvido assim que calculado, sem manter o
+    arquivo inteiro em memória. O parâmetro 'formato' escolhe a saída: 'csv' (padrão) ou 'ndjson'.
+
+    Erros no primeiro bloco retornam 400. Um erro em um bloco seguinte, com a resposta já iniciada,
+    encerra o corpo com um registro de erro: a linha '#ERRO,"<mensagem>"' no CSV ou o objeto
+    {"erro": "<mensagem>"} no NDJSON.
+    """
+    arquivo = request.files.get('arquivo')
+    if arquivo is None:
+        return "Envie o CSV de viagens no campo 'arquivo'", 400
+
+    formato = request.values.get('formato', 'csv')
+    if formato not in ('csv', 'ndjson'):
+        return "Formato inválido. Use 'csv' ou 'ndjson'", 400
+
+    from carbon_calculator import iterar_lotes
+
+    if not _vagas_lotes.acquire(blocking=False):
+        return "Muitos envios em lote em processamento, tente novamente em instantes", 503, {'Retry-After': '5'}
+    try:
+        tamanho_lote = int(request.values.get('tamanho_lote', TAMANHO_LOTE_UPLOAD))
+        lotes = iterar_lotes(arquivo.stream, max(1, tamanho_lote))
+        # Processa o primeiro bloco antes de responder, para que erros de formato retornem 400
+        primeiro_lote = next(lotes, None)
+    except Exception as e:
+        _vagas_lotes.release()
+        return f"Erro ao processar o arquivo: {str(e)}", 400
+    if primeiro_lote is None:
+        _vagas_lotes.release()
+        return "Arquivo sem viagens", 400
+
+    def gerar():
+        try:
+            if formato == 'csv':
+                yield primeiro_lote.to_csv(index=False)
+                for lote in lotes:
+                    yield lote.to_csv(index=False, header=False)
+            else:
+                for lote in itertools.chain([primeiro_lote], lotes):
+                    yield lote.to_json(orient='records', lines=True, force_ascii=False)
+        except Exception as e:
+            # O status 200 já foi enviado: o erro vira um registro final, para que o cliente
+            # não confunda a resposta interrompida com o resultado completo
+            app.logger.exception('Erro ao processar um bloco do envio em lote')
+            if formato == 'csv':
+                mensagem = str(e).replace('"', '""').replace('\n', ' ')
+                yield f'{MARCADOR_ERRO_CSV},"{mensagem}"\n'
+            else:
+                yield json.dumps({'erro': str(e)}, ensure_ascii=False) + '\n'
+
+    mimetype = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+    nome_saida = f"Relatorio_Carbono_Lote.{formato}"
+    resposta = Response(
+        stream_with_context(gerar()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={nome_saida}'},
+    )
+    # A vaga é liberada quando o servidor fecha a resposta (envio concluído ou cliente desconectado)
+    resposta.call_on_close(_vagas_lotes.release)
+    return resposta
+
+def _obter_armazem():
+    """
+    Abre o armazém de emissões uma vez por requisição (conexões SQLite não são compartilhadas entre threads).
+
+    As rotas da API apenas consultam: o banco é aberto somente para leitura, sem criar o arquivo nem
+    o esquema. Levanta FileNotFoundError se nenhuma viagem foi incorporada ainda (ver armazem.py).
+    """
+    if 'armazem' not in g:
+        from armazem import ArmazemEmissoes
+        g.armazem = ArmazemEmissoes(CAMINHO_ARMAZEM, somente_leitura=True)
+    return g.armazem
+
+@app.teardown_appcontext
+def _fechar_armazem(exc):
+    armazem = g.pop('armazem', None)
+    if armazem is not None:
+        armazem.fechar()
+
+def _filtros_consulta():
+    """Lê os filtros comuns das consultas: frota, combustivel, inicio e fim (AAAA-MM-DD)."""
+    return {campo: request.args.get(campo) or None for campo in ('frota', 'combustivel', 'inicio', 'fim')}
+
+@app.route('/api/emissoes/totais')
+def api_totais():
+    """Totais e intensidades das viagens filtradas por frota, combustível e intervalo de datas."""
+    try:
+        return jsonify(_obter_armazem().totais(**_filtros_consulta()))
+    except FileNotFoundError as e:
+        return jsonify(erro=str(e)), 404
+    except ValueError as e:
+        return jsonify(erro=str(e)), 400
+
+@app.route('/api/emissoes/maiores')
+def api_maiores_emissores():
+    """Maiores emissores agrupados por frota, combustível ou viagem ('por'), limitados a 'n'."""
+    filtros = _filtros_consulta()
+    filtros.pop('frota')
+    try:
+        maiores = _obter_armazem().maiores_emissores(
+            n=int(request.args.get('n', 10)),
+            por=request.args.get('por', 'frota'),
+            **filtros,
+        )
+        return jsonify(maiores.to_dict(orient='records'))
+    except FileNotFoundError as e:
+        return jsonify(erro=str(e)), 404
+    except ValueError as e:
+        return jsonify(erro=str(e)), 400
+
+@app.route('/api/emissoes/serie')
+def api_serie_temporal():
+    """Viagens e emissão final somadas por 'periodo' (dia, mes ou ano) no intervalo filtrado."""
+    try:
+        serie = _obter_armazem().serie_temporal(periodo=request.args.get('periodo', 'mes'), **_filtros_consulta())
+        return jsonify(serie.to_dict(orient='records'))
+    except FileNotFoundError as e:
+        return jsonify(erro=str(e)), 404
+    except ValueError as e:
+        return jsonify(erro=str(e)), 400
 
 @app.route('/download/<filename>')
 def download_file(filename):
-    """Rota para download do relatório Excel"""
+    """
+    Rota para download do relatório PDF.
+
+    Com '?status=1', retorna apenas o estado da geração em JSON. Enquanto o relatório
+    ainda estiver sendo gerado, o download responde 202 com o cabeçalho Retry-After.
+    """
     try:
-        caminho_arquivo = os.path.join(os.getcwd(), filename)
-        if os.path.exists(caminho_arquivo):
-            return send_file(caminho_arquivo, as_attachment=True)
+        status = status_relatorio(filename)
+        if request.args.get('status'):
+            return jsonify(status=status)
+        arquivo = abrir_relatorio(filename) if status == 'pronto' else None
+        if arquivo is not None:
+            return send_file(arquivo, mimetype='application/pdf', as_attachment=True, download_name=filename)
+        elif status == 'processando':
+            return "Relatório em processamento, tente novamente em instantes", 202, {'Retry-After': '1'}
+        elif status == 'erro':
+            return "Erro ao gerar o relatório", 500
         else:
             return "Arquivo não encontrado", 404
     except Exception as e:
         return f"Erro ao fazer download: {str(e)}", 500
 
+def aquecer():
+    """
+    Carrega antecipadamente o que as rotas carregariam sob demanda: pandas e o pipeline de cálculo,
+    o armazém, os estilos do ReportLab, o registro de fatores e a API key. Com 'gunicorn --preload'
+    e PRE_CARREGAR=1, roda uma única vez no processo mestre e os workers herdam tudo já carregado.
+    """
+    import armazem  # importa também carbon_calculator e pandas
+    from relatorio_pdf import obter_estilos
+
+    obter_estilos()
+    obter_registro()
+    obter_google_maps_key()
+
+if os.getenv('PRE_CARREGAR', '').lower() in ('1', 'true', 'sim'):
+    aquecer()
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,341 @@
+"""
+Armazém de emissões calculadas (SQLite).
+
+Guarda as viagens já calculadas (colunas geradas por 'calcular_intensidade'), com índices por
+'Frota_ID', 'Data' e 'Tipo_Combustivel' para consultas filtradas, e mantém os totais por frota,
+por veículo e por mês. Quando novas viagens chegam, apenas as que ainda não foram incorporadas
+(pelo 'ID_Viagem') passam pelo cálculo e são somadas aos agregados existentes, sem reprocessar
+o histórico.
+
+Uso:
+    python armazem.py viagens_janeiro.csv [--banco carbon_log.db]
+"""
+import argparse
+import os
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+from carbon_calculator import (
+    COLUNAS_AGREGADAS,
+    TAMANHO_LOTE_PADRAO,
+    agregar_por_frota,
+    intensidades_agregadas,
+    obter_registro,
+    processar_pipeline,
+    resolver_registro,
+    validar_colunas,
+)
+
+CAMINHO_BANCO_PADRAO = 'carbon_log.db'
+
+# Colunas das viagens calculadas guardadas no armazém: nome -> tipo SQLite
+COLUNAS_VIAGENS = {
+    'ID_Viagem': 'TEXT PRIMARY KEY',
+    'Data': 'TEXT',
+    'Frota_ID': 'TEXT',
+    'Tipo_Combustivel': 'TEXT',
+    'Combustivel_L': 'REAL',
+    'KM_Rodado': 'REAL',
+    'Carga_Ton': 'REAL',
+    'Numero_Eixos': 'INTEGER',
+    'Ano_Fabricacao': 'INTEGER',
+    'Fator_Emissao': 'REAL',
+    'emissao_base': 'REAL',
+    'Idade_Veiculo': 'INTEGER',
+    'Fator_idade': 'REAL',
+    'emissao_final': 'REAL',
+    'Intensidade_tCO2e_por_Ton': 'REAL',
+    'Intensidade_tCO2e_por_KM': 'REAL',
+    'Eficiencia_KM_por_L': 'REAL',
+}
+
+# Agrupamentos aceitos nas consultas de maiores emissores: nome -> coluna
+AGRUPAMENTOS = {
+    'frota': 'Frota_ID',
+    'combustivel': 'Tipo_Combustivel',
+    'viagem': 'ID_Viagem',
+}
+
+# Formato (strftime do SQLite) de cada período das séries temporais
+PERIODOS = {
+    'dia': '%Y-%m-%d',
+    'mes': '%Y-%m',
+    'ano': '%Y',
+}
+
+# Dimensões de agregação: nome -> coluna do DataFrame. 'veiculo' usa 'Veiculo_ID' quando o
+# arquivo a traz; no esquema de 'dados_exemplo.csv' cada 'Frota_ID' identifica o veículo.
+DIMENSOES = {
+    'frota': 'Frota_ID',
+    'veiculo': 'Veiculo_ID',
+}
+
+_COLUNAS_TABELA_VIAGENS = ',\n    '.join(f'{coluna} {tipo}' for coluna, tipo in COLUNAS_VIAGENS.items())
+
+_ESQUEMA = f"""
+CREATE TABLE IF NOT EXISTS metadados (
+    chave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS viagens (
+    {_COLUNAS_TABELA_VIAGENS}
+);
+-- Os filtros por frota, data e combustível usam estes índices. Como incluem a emissão final, as
+-- consultas que só leem a coluna do filtro, a data e essa emissão (ex.: séries temporais) são
+-- respondidas pelo próprio índice; 'totais' também soma consumo, distância, carga e emissão
+-- base, que não estão nos índices, e lê da tabela as linhas selecionadas pelo filtro
+CREATE INDEX IF NOT EXISTS idx_viagens_data ON viagens (Data, emissao_final);
+CREATE INDEX IF NOT EXISTS idx_viagens_frota ON viagens (Frota_ID, Data, emissao_final);
+CREATE INDEX IF NOT EXISTS idx_viagens_combustivel ON viagens (Tipo_Combustivel, Data, emissao_final);
+CREATE TABLE IF NOT EXISTS agregados (
+    dimensao TEXT NOT NULL,
+    chave TEXT NOT NULL,
+    mes TEXT NOT NULL,
+    Viagens INTEGER NOT NULL,
+    Combustivel_L REAL NOT NULL,
+    KM_Rodado REAL NOT NULL,
+    Carga_Ton REAL NOT NULL,
+    emissao_base REAL NOT NULL,
+    emissao_final REAL NOT NULL,
+    PRIMARY KEY (dimensao, chave, mes)
+);
+"""
+
+
+class ArmazemEmissoes:
+    """Viagens calculadas e agregados por frota, veículo e mês, atualizados de forma incremental."""
+
+    def __init__(self, caminho=CAMINHO_BANCO_PADRAO, registro=None, somente_leitura=False):
+        """
+        Args:
+            caminho (str): Arquivo SQLite (':memory:' para um armazém temporário)
+            registro (RegistroFatores, opcional): Fatores usados no cálculo. O armazém guarda a
+                versão e o ano de referência da primeira carga e recusa registros diferentes,
+                para que todos os agregados sejam comparáveis.
+            somente_leitura (bool): Se True, abre um banco já existente apenas para consultas, sem
+                criar o arquivo, o esquema ou os metadados. Não permite incorporar viagens.
+
+        Raises:
+            FileNotFoundError: Se 'somente_leitura' for True e o arquivo não existir
+        """
+        if somente_leitura:
+            if not os.path.isfile(caminho):
+                raise FileNotFoundError(f"Armazém de emissões '{caminho}' não encontrado")
+            self.conexao = sqlite3.connect(f'{Path(caminho).resolve().as_uri()}?mode=ro', uri=True)
+            self.registro = None
+            return
+        self.conexao = sqlite3.connect(caminho)
+        self.conexao.executescript(_ESQUEMA)
+        self.registro = self._fixar_registro(registro)
+
+    def _fixar_registro(self, registro):
+        metadados = dict(self.conexao.execute("SELECT chave, valor FROM metadados"))
+        if not metadados:
+            registro = resolver_registro(registro)
+            with self.conexao:
+                self.conexao.executemany(
+                    "INSERT INTO metadados (chave, valor) VALUES (?, ?)",
+                    [('versao', registro.versao), ('ano_referencia', str(registro.ano_referencia))],
+                )
+            return registro
+
+        chave_armazem = (metadados['versao'], int(metadados['ano_referencia']))
+        if registro is None:
+            registro = obter_registro(chave_armazem[1])
+        if registro.chave != chave_armazem:
+            raise ValueError(f"O armazém foi calculado com os fatores {chave_armazem} e não pode receber "
+                             f"viagens calculadas com {registro.chave}. Use outro arquivo de banco.")
+        return registro
+
+    def fechar(self):
+        self.conexao.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def _filtrar_novas(self, df):
+        """Retorna apenas as viagens cujo 'ID_Viagem' ainda não foi incorporado."""
+        df = df.drop_duplicates('ID_Viagem')
+        self.conexao.execute("CREATE TEMP TABLE IF NOT EXISTS ids_recebidos (ID_Viagem TEXT PRIMARY KEY)")
+        self.conexao.execute("DELETE FROM ids_recebidos")
+        self.conexao.executemany("INSERT INTO ids_recebidos VALUES (?)",
+                                 ((str(i),) for i in df['ID_Viagem']))
+        existentes = {linha[0] for linha in self.conexao.execute(
+            "SELECT r.ID_Viagem FROM ids_recebidos r JOIN viagens v USING (ID_Viagem)"
+        )}
+        if not existentes:
+            return df
+        return df[~df['ID_Viagem'].astype(str).isin(existentes)]
+
+    @staticmethod
+    def _agregar(df, dimensao, coluna):
+        meses = (pd.to_datetime(df['Data'], errors='coerce').dt.strftime('%Y-%m').fillna('')
+                 if 'Data' in df.columns else pd.Series('', index=df.index))
+        agregados = agregar_por_frota(df, [df[coluna].astype(str), meses])
+        return [(dimensao, chave, mes, *valores) for (chave, mes), valores
+                in zip(agregados.index, agregados.itertuples(index=False, name=None))]
+
+    def _inserir_viagens(self, df):
+        """Grava as viagens calculadas, com a data normalizada para 'AAAA-MM-DD'."""
+        viagens = pd.DataFrame({coluna: df[coluna] if coluna in df.columns else None
+                                for coluna in COLUNAS_VIAGENS})
+        viagens['ID_Viagem'] = viagens['ID_Viagem'].astype(str)
+        viagens['Data'] = pd.to_datetime(viagens['Data'], errors='coerce').dt.strftime('%Y-%m-%d')
+        viagens = viagens.astype(object).where(viagens.notna(), None)
+        self.conexao.executemany(
+            f"INSERT INTO viagens ({', '.join(COLUNAS_VIAGENS)}) VALUES ({', '.join('?' * len(COLUNAS_VIAGENS))})",
+            viagens.itertuples(index=False, name=None),
+        )
+
+    def incorporar(self, df):
+        """
+        Calcula as viagens ainda não incorporadas, guarda as viagens calculadas e soma seus
+        valores aos agregados.
+
+        Returns:
+            int: Número de viagens novas incorporadas
+        """
+        validar_colunas(df)
+        with self.conexao:
+            novas = self._filtrar_novas(df)
+            if novas.empty:
+                return 0
+            novas = processar_pipeline(novas.copy(), registro=self.registro)
+
+            linhas = []
+            for dimensao, coluna in DIMENSOES.items():
+                if coluna not in novas.columns:
+                    coluna = 'Frota_ID'
+                linhas.extend(self._agregar(novas, dimensao, coluna))
+
+            atualizacoes = ", ".join(f"{c} = {c} + excluded.{c}" for c in ['Viagens'] + COLUNAS_AGREGADAS)
+            self.conexao.executemany(
+                f"INSERT INTO agregados (dimensao, chave, mes, Viagens, {', '.join(COLUNAS_AGREGADAS)}) "
+                f"VALUES (?, ?, ?, ?, {', '.join('?' * len(COLUNAS_AGREGADAS))}) "
+                f"ON CONFLICT (dimensao, chave, mes) DO UPDATE SET {atualizacoes}",
+                linhas,
+            )
+            self._inserir_viagens(novas)
+        return len(novas)
+
+    def incorporar_arquivo(self, caminho, tamanho_lote=TAMANHO_LOTE_PADRAO):
+        """Incorpora um CSV de viagens bloco a bloco. Retorna o número de viagens novas."""
+        return sum(self.incorporar(lote)
+                   for lote in pd.read_csv(caminho, encoding='utf-8', chunksize=tamanho_lote))
+
+    def consultar(self, dimensao='frota', por_mes=False, mes=None):
+        """
+        Retorna os totais e intensidades de uma dimensão ('frota' ou 'veiculo').
+
+        Args:
+            dimensao (str): Dimensão de agregação
+            por_mes (bool): Se True, mantém uma linha por chave e mês
+            mes (str, opcional): Restringe a um mês ('AAAA-MM')
+        """
+        if dimensao not in DIMENSOES:
+            raise ValueError(f"Dimensão '{dimensao}' inválida. Dimensões disponíveis: {list(DIMENSOES)}")
+
+        colunas = ['Viagens'] + COLUNAS_AGREGADAS
+        agrupamento = "chave, mes" if por_mes else "chave"
+        filtro, parametros = "dimensao = ?", [dimensao]
+        if mes is not None:
+            filtro += " AND mes = ?"
+            parametros.append(mes)
+        consulta = (f"SELECT {agrupamento}, {', '.join(f'SUM({c}) AS {c}' for c in colunas)} "
+                    f"FROM agregados WHERE {filtro} GROUP BY {agrupamento} ORDER BY {agrupamento}")
+        totais = pd.read_sql_query(consulta, self.conexao, params=parametros)
+        totais = totais.set_index(['chave', 'mes'] if por_mes else 'chave')
+        return intensidades_agregadas(totais)
+
+    @staticmethod
+    def _filtros(frota=None, combustivel=None, inicio=None, fim=None):
+        """Monta a cláusula WHERE (sobre colunas indexadas) e seus parâmetros."""
+        condicoes, parametros = [], []
+        if frota is not None:
+            condicoes.append("Frota_ID = ?")
+            parametros.append(frota)
+        if combustivel is not None:
+            condicoes.append("Tipo_Combustivel = ?")
+            parametros.append(combustivel)
+        if inicio is not None:
+            condicoes.append("Data >= ?")
+            parametros.append(inicio)
+        if fim is not None:
+            condicoes.append("Data <= ?")
+            parametros.append(fim)
+        return (" WHERE " + " AND ".join(condicoes)) if condicoes else "", parametros
+
+    def totais(self, frota=None, combustivel=None, inicio=None, fim=None):
+        """
+        Retorna os totais e as intensidades das viagens que atendem aos filtros.
+
+        Args:
+            frota (str, opcional): 'Frota_ID'
+            combustivel (str, opcional): 'Tipo_Combustivel'
+            inicio, fim (str, opcional): Intervalo de datas ('AAAA-MM-DD'), inclusive
+        """
+        filtro, parametros = self._filtros(frota, combustivel, inicio, fim)
+        colunas = ', '.join(f'COALESCE(SUM({c}), 0)' for c in COLUNAS_AGREGADAS)
+        linha = self.conexao.execute(
+            f"SELECT COUNT(*), {colunas} FROM viagens{filtro}", parametros
+        ).fetchone()
+        totais = intensidades_agregadas(pd.DataFrame([linha], columns=['Viagens'] + COLUNAS_AGREGADAS))
+        return totais.to_dict(orient='records')[0]
+
+    def maiores_emissores(self, n=10, por='frota', combustivel=None, inicio=None, fim=None):
+        """
+        Retorna os 'n' maiores emissores (pela emissão final) agrupados por frota, combustível ou viagem.
+        """
+        if por not in AGRUPAMENTOS:
+            raise ValueError(f"Agrupamento '{por}' inválido. Agrupamentos disponíveis: {list(AGRUPAMENTOS)}")
+        coluna = AGRUPAMENTOS[por]
+        filtro, parametros = self._filtros(None, combustivel, inicio, fim)
+        return pd.read_sql_query(
+            f"SELECT {coluna}, COUNT(*) AS Viagens, SUM(emissao_final) AS emissao_final "
+            f"FROM viagens{filtro} GROUP BY {coluna} ORDER BY emissao_final DESC, {coluna} LIMIT ?",
+            self.conexao, params=parametros + [int(n)],
+        )
+
+    def serie_temporal(self, periodo='mes', frota=None, combustivel=None, inicio=None, fim=None):
+        """Retorna viagens e emissão final somadas por dia, mês ou ano no intervalo pedido."""
+        if periodo not in PERIODOS:
+            raise ValueError(f"Período '{periodo}' inválido. Períodos disponíveis: {list(PERIODOS)}")
+        filtro, parametros = self._filtros(frota, combustivel, inicio, fim)
+        return pd.read_sql_query(
+            f"SELECT strftime('{PERIODOS[periodo]}', Data) AS periodo, COUNT(*) AS Viagens, "
+            f"SUM(emissao_final) AS emissao_final FROM viagens{filtro} GROUP BY periodo ORDER BY periodo",
+            self.conexao, params=parametros,
+        )
+
+    def totais_gerais(self):
+        """Retorna o número de viagens e as emissões base e final de todo o histórico."""
+        viagens, base, final = self.conexao.execute(
+            "SELECT COALESCE(SUM(Viagens), 0), COALESCE(SUM(emissao_base), 0), COALESCE(SUM(emissao_final), 0) "
+            "FROM agregados WHERE dimensao = 'frota'"
+        ).fetchone()
+        return {'viagens': viagens, 'emissao_base_total': base, 'emissao_final_total': final}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incorpora viagens novas ao armazém de emissões')
+    parser.add_argument('arquivos', nargs='+', help='CSVs de viagens')
+    parser.add_argument('--banco', default=CAMINHO_BANCO_PADRAO, help='Arquivo SQLite do armazém')
+    args = parser.parse_args()
+
+    with ArmazemEmissoes(args.banco) as armazem:
+        for caminho in args.arquivos:
+            novas = armazem.incorporar_arquivo(caminho)
+            print(f"{caminho}: {novas} viagens novas incorporadas")
+        totais = armazem.totais_gerais()
+        print(f"\nEmissão BASE TOTAL (tCO2e): {totais['emissao_base_total']:.3f} toneladas")
+        print(f"Emissão FINAL TOTAL (tCO2e): {totais['emissao_final_total']:.3f} toneladas")
+        print(armazem.consultar('frota', por_mes=True))
+
+
+if __name__ == '__main__':
+    main()
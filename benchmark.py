@@ -0,0 +1,325 @@
+"""
+Benchmarks do Carbon Log.
+
+- Etapas em lote: gera viagens sintéticas no esquema de 'dados_exemplo.csv' (1 mil, 100 mil e
+  10 milhões de linhas por padrão) e mede tempo e pico de memória (tracemalloc) de
+  'calcular_emissao', 'calcular_fator_idade', 'calcular_intensidade' e 'gerar_relatorio_excel'.
+- Relatório PDF: tempo e memória de 'gerar_relatorio_pdf' para uma viagem.
+- Cálculo individual: compara o caminho anterior, que montava um DataFrame de uma linha e
+  executava as três etapas em pandas, com o caminho escalar atual ('calcular_viagem').
+- Rota /calcular: teste de carga pelo cliente de testes do Flask, com entradas repetidas
+  (acertos de cache) e distintas.
+- Inicialização: em processos novos, tempo de 'import app' e da primeira requisição, com e sem
+  pré-carregamento (PRE_CARREGAR=1).
+
+O resultado é impresso (ou gravado com --saida) em JSON, junto com as versões do ambiente,
+para acompanhar regressões entre versões.
+
+Uso:
+    python benchmark.py [--repeticoes N] [--tamanhos 1000,100000,10000000] [--saida resultado.json]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from carbon_calculator import (
+    calcular_emissao,
+    calcular_fator_idade,
+    calcular_intensidade,
+    calcular_viagem,
+    gerar_relatorio_excel,
+)
+
+TAMANHOS_PADRAO = (1_000, 100_000, 10_000_000)
+
+# Acima deste número de linhas o Excel não é gerado (tempo de gravação proibitivo);
+# o resultado registra o motivo.
+MAX_LINHAS_EXCEL_PADRAO = 100_000
+
+# Distribuição aproximada dos combustíveis em uma frota de carga
+PROPORCAO_COMBUSTIVEIS = {'Diesel S10': 0.8, 'Gasolina': 0.12, 'Etanol': 0.08}
+
+FORMULARIO_EXEMPLO = {
+    'email': 'benchmark@example.com',
+    'tipo_veiculo': 'caminhao',
+    'tipo_combustivel': 'Diesel S10',
+    'modo_calculo': 'estimado',
+    'km_rodado': '850',
+    'km_por_litro': '3.2',
+    'carga_ton': '18',
+}
+
+
+def _calcular_via_dataframe(litros, tipo_combustivel, km_rodado, carga_ton, ano_fabricacao):
+    """Reproduz o caminho anterior da rota /calcular (DataFrame de uma linha + três etapas pandas)."""
+    dados_viagem = pd.DataFrame({
+        'ID_Viagem': ['WEB_001'],
+        'Data': [datetime.now().strftime('%Y-%m-%d')],
+        'Frota_ID': ['WEB'],
+        'Combustivel_L': [litros],
+        'Tipo_Combustivel': [tipo_combustivel],
+        'KM_Rodado': [km_rodado],
+        'Carga_Ton': [carga_ton],
+        'Numero_Eixos': [0],
+        'Ano_Fabricacao': [ano_fabricacao],
+    })
+    dados_final = calcular_intensidade(calcular_fator_idade(calcular_emissao(dados_viagem)))
+    return dados_final.iloc[0]
+
+
+def _cronometrar(funcao, repeticoes):
+    """Executa 'funcao' 'repeticoes' vezes e retorna estatísticas de latência em milissegundos."""
+    amostras = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        amostras.append((time.perf_counter() - inicio) * 1000)
+    amostras.sort()
+    return {
+        'repeticoes': repeticoes,
+        'media_ms': statistics.fmean(amostras),
+        'mediana_ms': statistics.median(amostras),
+        'p95_ms': amostras[int(0.95 * (len(amostras) - 1))],
+    }
+
+
+def gerar_dados_sinteticos(n_linhas, semente=42):
+    """
+    Gera 'n_linhas' viagens reprodutíveis no esquema de 'dados_exemplo.csv'.
+
+    Os valores seguem faixas plausíveis (distância, consumo, carga, eixos e ano de fabricação);
+    a mesma semente sempre gera os mesmos dados.
+    """
+    gerador = np.random.default_rng(semente)
+    km_rodado = gerador.uniform(50, 3000, n_linhas).round(0)
+    combustiveis = gerador.choice(list(PROPORCAO_COMBUSTIVEIS), n_linhas, p=list(PROPORCAO_COMBUSTIVEIS.values()))
+    datas = pd.date_range('2025-01-01', periods=365).strftime('%Y-%m-%d').to_numpy(dtype=object)
+    frotas = np.array([f'C{i:02d}{chr(65 + i % 26)}' for i in range(100)], dtype=object)
+    return pd.DataFrame({
+        'ID_Viagem': pd.Series(np.arange(1, n_linhas + 1)).map('V{:08d}'.format),
+        'Data': datas[gerador.integers(0, len(datas), n_linhas)],
+        'Frota_ID': frotas[gerador.integers(0, len(frotas), n_linhas)],
+        'Combustivel_L': (km_rodado / gerador.uniform(2.5, 12, n_linhas)).round(1),
+        'Tipo_Combustivel': combustiveis.astype(object),
+        'KM_Rodado': km_rodado,
+        'Carga_Ton': gerador.integers(0, 40, n_linhas),
+        'Numero_Eixos': gerador.integers(2, 10, n_linhas),
+        'Ano_Fabricacao': gerador.integers(1990, datetime.now().year + 1, n_linhas),
+    })
+
+
+def _medir(funcao, rastrear_alocacoes=True):
+    """
+    Executa 'funcao' uma vez e retorna (resultado, medição).
+
+    Com 'rastrear_alocacoes', a medição traz o pico de memória alocada durante a chamada
+    (tracemalloc). O tracemalloc deixa muito lentos códigos com milhões de pequenas alocações
+    (ex.: openpyxl); nesses casos a medição traz o aumento do pico de memória residente do
+    processo, que só é registrado quando a chamada ultrapassa o maior pico anterior.
+    """
+    rss_antes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if rastrear_alocacoes:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        resultado = funcao()
+        medicao = {'tempo_s': time.perf_counter() - inicio}
+        if rastrear_alocacoes:
+            medicao['pico_memoria_mb'] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    finally:
+        if rastrear_alocacoes:
+            tracemalloc.stop()
+    # ru_maxrss é informado em KiB no Linux
+    medicao['aumento_rss_max_mb'] = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_antes) / 1024
+    return resultado, medicao
+
+
+def benchmark_etapas(n_linhas, max_linhas_excel=MAX_LINHAS_EXCEL_PADRAO):
+    """Mede cada etapa de cálculo e a geração do Excel sobre 'n_linhas' viagens sintéticas."""
+    dados, geracao = _medir(lambda: gerar_dados_sinteticos(n_linhas))
+    resultado = {'linhas': n_linhas, 'geracao_dados': geracao}
+
+    for etapa in (calcular_emissao, calcular_fator_idade, calcular_intensidade):
+        dados, medicao = _medir(lambda: etapa(dados))
+        medicao['linhas_por_s'] = n_linhas / medicao['tempo_s'] if medicao['tempo_s'] else None
+        resultado[etapa.__name__] = medicao
+
+    if n_linhas > max_linhas_excel:
+        resultado['gerar_relatorio_excel'] = {'ignorado': f'mais de {max_linhas_excel} linhas'}
+    else:
+        diretorio_original = os.getcwd()
+        with tempfile.TemporaryDirectory() as diretorio:
+            os.chdir(diretorio)
+            try:
+                # gerar_relatorio_excel imprime o resumo; o JSON final não deve ser misturado a ele
+                with redirect_stdout(io.StringIO()):
+                    _, medicao = _medir(lambda: gerar_relatorio_excel(dados), rastrear_alocacoes=False)
+                medicao['tamanho_arquivo_mb'] = os.path.getsize('Relatorio_Carbono_Frota.xlsx') / 1024 ** 2
+            finally:
+                os.chdir(diretorio_original)
+        resultado['gerar_relatorio_excel'] = medicao
+    return resultado
+
+
+def benchmark_relatorio_pdf(repeticoes=20):
+    """Mede 'gerar_relatorio_pdf' para uma viagem (tempo por documento e pico de memória)."""
+    from app import _calcular_resultado
+    from fatores import obter_registro
+    from relatorio_pdf import gerar_relatorio_pdf
+
+    dados = _calcular_resultado('caminhao', 'Diesel S10', 'estimado', 265.625, 850.0, 3.2, 18.0, True,
+                                obter_registro())
+    dados.update(data_relatorio='01/01/2025 às 12:00', email='benchmark@example.com',
+                 endereco_origem='Não informado', endereco_destino='Não informado')
+
+    _, memoria = _medir(lambda: gerar_relatorio_pdf(dados, io.BytesIO()))
+    return {
+        **_cronometrar(lambda: gerar_relatorio_pdf(dados, io.BytesIO()), repeticoes),
+        'pico_memoria_mb': memoria['pico_memoria_mb'],
+    }
+
+
+def benchmark_calculo_individual(repeticoes=1000):
+    """Compara o cálculo de uma viagem via DataFrame (anterior) e via 'calcular_viagem' (atual)."""
+    ano = datetime.now().year
+    argumentos = (265.625, 'Diesel S10', 850.0, 18.0, ano)
+    return {
+        'dataframe': _cronometrar(lambda: _calcular_via_dataframe(*argumentos), repeticoes),
+        'escalar': _cronometrar(
+            lambda: calcular_viagem(argumentos[0], argumentos[1], km_rodado=argumentos[2],
+                                    carga_ton=argumentos[3], ano_fabricacao=argumentos[4]),
+            repeticoes,
+        ),
+    }
+
+
+def benchmark_rota_calcular(repeticoes=50):
+    """
+    Teste de carga de POST /calcular pelo cliente de testes do Flask.
+
+    'repetido' envia sempre o mesmo formulário (atendido pelo cache de cálculos); 'distinto'
+    varia a distância a cada requisição, medindo o cálculo e o agendamento do PDF sem cache.
+    """
+    from app import app
+
+    cliente = app.test_client()
+    distancias = iter(range(1, 10 ** 9))
+
+    def requisitar(formulario):
+        resposta = cliente.post('/calcular', data=formulario)
+        if resposta.status_code != 200:
+            raise RuntimeError(f"/calcular retornou {resposta.status_code}")
+
+    def medir(funcao):
+        inicio = time.perf_counter()
+        estatisticas = _cronometrar(funcao, repeticoes)
+        estatisticas['requisicoes_por_s'] = repeticoes / (time.perf_counter() - inicio)
+        return estatisticas
+
+    return {
+        'repetido': medir(lambda: requisitar(FORMULARIO_EXEMPLO)),
+        'distinto': medir(lambda: requisitar({**FORMULARIO_EXEMPLO, 'km_rodado': str(next(distancias))})),
+    }
+
+
+# Executado em um processo novo por 'benchmark_inicializacao'; imprime as medições em JSON
+_SCRIPT_INICIALIZACAO = '''
+import json, sys, time
+inicio = time.perf_counter()
+import app
+importacao_s = time.perf_counter() - inicio
+carregados = {modulo: modulo in sys.modules for modulo in ('pandas', 'reportlab')}
+cliente = app.app.test_client()
+inicio = time.perf_counter()
+cliente.get('/')
+primeira_pagina_s = time.perf_counter() - inicio
+inicio = time.perf_counter()
+cliente.post('/calcular', data=json.loads(sys.argv[1]))
+primeiro_calculo_s = time.perf_counter() - inicio
+print(json.dumps({'importacao_s': importacao_s, 'primeira_pagina_s': primeira_pagina_s,
+                  'primeiro_calculo_s': primeiro_calculo_s, 'carregados_apos_importacao': carregados}))
+'''
+
+
+def benchmark_inicializacao(repeticoes=5):
+    """
+    Mede, em processos Python novos, o tempo de 'import app', da primeira página e do primeiro
+    POST /calcular, com carregamento sob demanda e com PRE_CARREGAR=1 (como em 'gunicorn --preload').
+    """
+    diretorio_projeto = os.path.dirname(os.path.abspath(__file__))
+    resultados = {}
+    for modo, pre_carregar in (('sob_demanda', ''), ('pre_carregado', '1')):
+        ambiente = {**os.environ, 'PRE_CARREGAR': pre_carregar,
+                    'PYTHONPATH': os.pathsep.join(filter(None, [diretorio_projeto, os.getenv('PYTHONPATH')]))}
+        amostras = []
+        with tempfile.TemporaryDirectory() as diretorio:
+            for _ in range(repeticoes):
+                saida = subprocess.run([sys.executable, '-c', _SCRIPT_INICIALIZACAO, json.dumps(FORMULARIO_EXEMPLO)],
+                                       cwd=diretorio, env=ambiente, capture_output=True, text=True, check=True)
+                amostras.append(json.loads(saida.stdout.strip().splitlines()[-1]))
+        resultados[modo] = {
+            'repeticoes': repeticoes,
+            **{medida: statistics.median(amostra[medida] for amostra in amostras)
+               for medida in ('importacao_s', 'primeira_pagina_s', 'primeiro_calculo_s')},
+            'carregados_apos_importacao': amostras[-1]['carregados_apos_importacao'],
+        }
+    return resultados
+
+
+def _ambiente():
+    """Versões e máquina em que o benchmark rodou, para comparar resultados entre versões."""
+    from importlib.metadata import version
+
+    return {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        **{pacote: version(pacote) for pacote in ('pandas', 'numpy', 'flask', 'openpyxl', 'reportlab')},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks do Carbon Log')
+    parser.add_argument('--repeticoes', type=int, default=1000,
+                        help='Repetições do cálculo individual (a rota e o PDF usam 1/20 desse valor)')
+    parser.add_argument('--tamanhos', default=','.join(str(n) for n in TAMANHOS_PADRAO),
+                        help='Números de linhas dos conjuntos sintéticos, separados por vírgula')
+    parser.add_argument('--max-linhas-excel', type=int, default=MAX_LINHAS_EXCEL_PADRAO,
+                        help='Maior conjunto para o qual o Excel é gerado')
+    parser.add_argument('--saida', help='Grava o JSON neste arquivo em vez de imprimi-lo')
+    args = parser.parse_args()
+
+    tamanhos = [int(valor) for valor in args.tamanhos.split(',') if valor.strip()]
+    resultados = {
+        'ambiente': _ambiente(),
+        'etapas': [benchmark_etapas(n, args.max_linhas_excel) for n in tamanhos],
+        'relatorio_pdf': benchmark_relatorio_pdf(max(1, args.repeticoes // 20)),
+        'calculo_individual': benchmark_calculo_individual(args.repeticoes),
+        'rota_calcular': benchmark_rota_calcular(max(1, args.repeticoes // 20)),
+        'inicializacao': benchmark_inicializacao(),
+    }
+    texto = json.dumps(resultados, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
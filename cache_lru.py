@@ -0,0 +1,113 @@
+"""
+Cache LRU em memória, seguro para uso entre threads.
+
+Os itens são descartados pelo menos recentemente usado quando o número de itens ou o total de
+bytes ultrapassa o limite configurado, e expiram após 'ttl_segundos' (quando informado).
+Acertos, falhas e descartes são contados para ajudar a dimensionar o cache.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """Cache LRU limitado por número de itens, por tamanho total em bytes e por tempo de vida."""
+
+    def __init__(self, max_itens=128, ttl_segundos=None, max_bytes=None, tamanho=len):
+        """
+        Args:
+            max_itens (int): Número máximo de itens mantidos
+            ttl_segundos (float, opcional): Tempo de vida de cada item. None = sem expiração.
+            max_bytes (int, opcional): Soma máxima de 'tamanho(valor)' dos itens. None = sem limite.
+            tamanho (callable): Função que mede o tamanho de um valor em bytes (usada com 'max_bytes')
+        """
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_segundos
+        self.max_bytes = max_bytes
+        self._tamanho = tamanho
+        self._itens = OrderedDict()  # chave -> (valor, tamanho, instante de expiração)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+
+    def _remover(self, chave):
+        _, tamanho, _ = self._itens.pop(chave)
+        self._bytes -= tamanho
+
+    def _expirado(self, expira_em):
+        return expira_em is not None and time.monotonic() >= expira_em
+
+    def obter(self, chave, padrao=None):
+        """Retorna o valor da chave (marcando-o como usado recentemente) ou 'padrao'."""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.falhas += 1
+                return padrao
+            if self._expirado(item[2]):
+                self._remover(chave)
+                self.falhas += 1
+                return padrao
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return item[0]
+
+    def definir(self, chave, valor):
+        """Armazena o valor e descarta os itens menos usados até respeitar os limites."""
+        tamanho = self._tamanho(valor) if self.max_bytes is not None else 0
+        expira_em = None if self.ttl_segundos is None else time.monotonic() + self.ttl_segundos
+        with self._lock:
+            if chave in self._itens:
+                self._remover(chave)
+            self._itens[chave] = (valor, tamanho, expira_em)
+            self._bytes += tamanho
+            while self._itens and (
+                len(self._itens) > self.max_itens
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                self._remover(next(iter(self._itens)))
+                self.descartes += 1
+
+    def remover_expirados(self):
+        """Descarta todos os itens cujo tempo de vida já terminou."""
+        with self._lock:
+            for chave in [c for c, (_, _, expira_em) in self._itens.items() if self._expirado(expira_em)]:
+                self._remover(chave)
+
+    def limpar(self):
+        """Remove todos os itens."""
+        with self._lock:
+            self._itens.clear()
+            self._bytes = 0
+
+    def estatisticas(self):
+        """Retorna os contadores de uso e a ocupação atual do cache."""
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'itens': len(self._itens),
+                'max_itens': self.max_itens,
+                'bytes': self._bytes,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'descartes': self.descartes,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+            }
+
+    def __contains__(self, chave):
+        """Verifica se a chave está no cache (e não expirou), sem afetar os contadores nem a ordem LRU."""
+        with self._lock:
+            item = self._itens.get(chave)
+            return item is not None and not self._expirado(item[2])
+
+    def __len__(self):
+        with self._lock:
+            return len(self._itens)
+
+    @property
+    def bytes_ocupados(self):
+        """Soma dos tamanhos dos itens armazenados (0 quando não há limite em bytes)."""
+        return self._bytes
+
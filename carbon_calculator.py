@@ -1,40 +1,227 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
-from datetime import datetime
 
-def carregar_dados():
+# Fatores, blocos de penalidade e o cálculo individual vivem em fatores.py (sem pandas);
+# são reexportados aqui para manter a interface do módulo de cálculo.
+from fatores import (
+    FAIXAS_PENALIDADE,
+    TAXA_PENALIDADE_MINIMA,
+    RegistroFatores,
+    calcular_viagem,
+    obter_registro,
+    resolver_registro,
+)
+from distancias import preencher_km_rodado
+from metricas import cronometrar, registro_metricas
+
+# Linhas que passaram pelas três etapas de cálculo neste processo
+linhas_processadas = registro_metricas.contador(
+    'carbonlog_pipeline_linhas_total', 'Viagens processadas pelo pipeline de cálculo')
+
+# --- MÓDULO A: Leitura e gravação de dados (formatos plugáveis) ---
+def _importar_pyarrow():
+    """Importa o pyarrow sob demanda; ele só é necessário para os formatos Parquet e Arrow."""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Os formatos Parquet e Arrow exigem o pacote 'pyarrow' (pip install pyarrow)")
+    return pyarrow
+
+def _ler_csv(caminho, colunas=None):
+    return pd.read_csv(caminho, encoding='utf-8', usecols=colunas)
+
+def _ler_parquet(caminho, colunas=None):
+    pa = _importar_pyarrow()
+    # Lê apenas as colunas pedidas, mapeando o arquivo em memória em vez de copiá-lo
+    return pa.parquet.read_table(caminho, columns=colunas, memory_map=True).to_pandas()
+
+def _ler_arrow(caminho, colunas=None):
+    pa = _importar_pyarrow()
+    with pa.memory_map(os.fspath(caminho), 'r') as fonte:
+        tabela = pa.ipc.open_file(fonte).read_all()
+        if colunas is not None:
+            tabela = tabela.select(colunas)
+        return tabela.to_pandas()
+
+def _escrever_csv(df, caminho):
+    df.to_csv(caminho, index=False, encoding='utf-8')
+
+def _escrever_excel(df, caminho):
+    # Importado sob demanda: exportar_excel depende deste módulo
+    from exportar_excel import exportar_excel
+    exportar_excel(df, caminho, resumos=False)
+
+def _escrever_parquet(df, caminho):
+    _importar_pyarrow()
+    df.to_parquet(caminho, engine='pyarrow', index=False)
+
+def _escrever_arrow(df, caminho):
+    pa = _importar_pyarrow()
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(os.fspath(caminho), 'wb') as destino, pa.ipc.new_file(destino, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+
+# Leitores e escritores por formato (extensão do arquivo). Novos formatos podem ser
+# adicionados com registrar_formato().
+LEITORES = {
+    'csv': _ler_csv,
+    'parquet': _ler_parquet,
+    'arrow': _ler_arrow,
+    'feather': _ler_arrow,
+}
+ESCRITORES = {
+    'csv': _escrever_csv,
+    'xlsx': _escrever_excel,
+    'parquet': _escrever_parquet,
+    'arrow': _escrever_arrow,
+    'feather': _escrever_arrow,
+}
+
+def registrar_formato(formato, leitor=None, escritor=None):
+    """
+    Registra um leitor 'leitor(caminho, colunas=None) -> DataFrame' e/ou um escritor
+    'escritor(df, caminho)' para o formato (extensão sem ponto) informado.
     """
-    Carrega o arquivo 'dados_exemplo.csv' no formato UTF-8 e retorna o DataFrame.
+    if leitor is not None:
+        LEITORES[formato.lower()] = leitor
+    if escritor is not None:
+        ESCRITORES[formato.lower()] = escritor
+
+def _identificar_formato(caminho, formato, registro):
+    formato = (formato or os.path.splitext(str(caminho))[1].lstrip('.')).lower()
+    if formato not in registro:
+        raise ValueError(f"Formato '{formato}' não suportado. Formatos disponíveis: {sorted(registro)}")
+    return formato
+
+def carregar_dados(caminho='dados_exemplo.csv', colunas=None, formato=None, compacto=False):
+    """
+    Carrega o arquivo de viagens (por padrão 'dados_exemplo.csv') e retorna o DataFrame.
+    
+    O formato é deduzido da extensão do arquivo: CSV (UTF-8), Parquet ou Arrow IPC/Feather.
+    Parquet e Arrow são lidos com mapeamento em memória e preservam os tipos das colunas.
+    
+    Args:
+        caminho (str): Caminho do arquivo
+        colunas (list, opcional): Colunas a carregar (projeção). Se omitido, carrega todas.
+        formato (str, opcional): Força o formato ('csv', 'parquet', 'arrow', 'feather')
+        compacto (bool): Se True, converte as colunas para os tipos compactos (ver compactar_tipos)
     
     Returns:
-        pandas.DataFrame: DataFrame com os dados do arquivo CSV
+        pandas.DataFrame: DataFrame com os dados do arquivo
     """
     try:
-        # Carrega o arquivo CSV com encoding UTF-8
-        df = pd.read_csv('dados_exemplo.csv', encoding='utf-8')
-        
-        return df
+        leitor = LEITORES[_identificar_formato(caminho, formato, LEITORES)]
+        df = leitor(caminho, colunas=colunas)
+        return compactar_tipos(df) if compacto else df
     
     except FileNotFoundError:
-        print("Erro: Arquivo 'dados_exemplo.csv' não encontrado.")
+        print(f"Erro: Arquivo '{caminho}' não encontrado.")
         return None
     except Exception as e:
         print(f"Erro ao carregar o arquivo: {e}")
         return None
 
+def salvar_resultados(df, caminho, formato=None):
+    """
+    Salva o DataFrame no formato deduzido da extensão do arquivo: CSV, Excel (.xlsx),
+    Parquet ou Arrow IPC/Feather. O índice das linhas não é incluído.
+    """
+    escritor = ESCRITORES[_identificar_formato(caminho, formato, ESCRITORES)]
+    escritor(df, caminho)
+
+# --- Tipos compactos ---
+# Tipos usados no modo compacto. Combustivel_L permanece float64 por determinar diretamente a
+# emissão; carga e distância em float32 mantêm ~7 dígitos significativos, suficientes para
+# as intensidades exibidas com 6 casas decimais.
+TIPOS_COMPACTOS = {
+    'Frota_ID': 'category',
+    'Data': 'category',
+    'Numero_Eixos': 'int8',
+    'Ano_Fabricacao': 'int16',
+    'Carga_Ton': 'float32',
+    'KM_Rodado': 'float32',
+}
+
+def _cabe_em_inteiro(serie, tipo):
+    """Indica se todos os valores da série são inteiros representáveis em 'tipo', sem ausentes."""
+    if not pd.api.types.is_numeric_dtype(serie) or serie.isna().any():
+        return False
+    limites = np.iinfo(tipo)
+    valores = serie.to_numpy()
+    return bool(((valores == np.floor(valores)) & (valores >= limites.min) & (valores <= limites.max)).all())
+
+def compactar_tipos(df):
+    """
+    Converte as colunas de viagens para tipos compactos: categorias para combustível, frota e data,
+    inteiros pequenos para eixos e ano de fabricação e float32 para carga e distância.
+    
+    As categorias de 'Tipo_Combustivel' são fixas (os combustíveis com fator de emissão), de
+    modo que blocos lidos separadamente tenham o mesmo tipo. Colunas inteiras com valores
+    ausentes, fracionários ou fora da faixa do tipo compacto são mantidas como estão, em vez
+    de truncadas.
+    """
+    tipos = dict(TIPOS_COMPACTOS)
+    combustiveis = list(definir_fatores_emissao())
+    if 'Tipo_Combustivel' in df.columns:
+        # Combustíveis desconhecidos viram categorias extras em vez de valores ausentes
+        extras = sorted(set(df['Tipo_Combustivel'].dropna().unique()) - set(combustiveis))
+        tipos['Tipo_Combustivel'] = pd.CategoricalDtype(combustiveis + extras)
+
+    for coluna, tipo in tipos.items():
+        if coluna not in df.columns:
+            continue
+        if tipo in ('int8', 'int16') and not _cabe_em_inteiro(df[coluna], tipo):
+            continue
+        df[coluna] = df[coluna].astype(tipo)
+    return df
+
+def relatorio_memoria(df):
+    """
+    Retorna o uso de memória (em bytes, incluindo o conteúdo de strings) de cada coluna e o total.
+    """
+    uso = df.memory_usage(deep=True, index=False)
+    uso['Total'] = uso.sum()
+    return uso
+
+def comparar_memoria(caminho='dados_exemplo.csv', processar=True):
+    """
+    Carrega o arquivo no modo padrão e no modo compacto e compara o uso de memória por coluna.
+    
+    Args:
+        caminho (str): Arquivo de viagens
+        processar (bool): Se True, compara os DataFrames após as três etapas de cálculo
+    
+    Returns:
+        pandas.DataFrame: Colunas 'padrao_bytes', 'compacto_bytes' e 'reducao' (razão padrão/compacto)
+    """
+    padrao = carregar_dados(caminho)
+    compacto = carregar_dados(caminho, compacto=True)
+    if processar:
+        padrao = processar_pipeline(padrao)
+        compacto = processar_pipeline(compacto)
+
+    comparacao = pd.DataFrame({
+        'padrao_bytes': relatorio_memoria(padrao),
+        'compacto_bytes': relatorio_memoria(compacto),
+    })
+    comparacao['reducao'] = comparacao['padrao_bytes'] / comparacao['compacto_bytes']
+    return comparacao
+
 # --- MÓDULO B: Fatores de Emissão (Constantes Técnicas) ---
-def definir_fatores_emissao():
+def definir_fatores_emissao(registro=None):
     """
-    Define os fatores de emissão padronizados (GHG Protocol Brasil) em tCO2e/L.
+    Retorna os fatores de emissão padronizados (GHG Protocol Brasil) em tCO2e/L.
+    
+    Os fatores vêm do registro de fatores (ver fatores.py), carregado uma única vez;
+    o mapeamento retornado é somente leitura.
     """
-    # Fatores baseados em referências como GHG Protocol Brasil (adaptado para fins didáticos)
-    fatores = {
-        'Diesel S10': 0.002671,  # 2.671 kg CO2e por Litro de Diesel
-        'Gasolina': 0.00232,    # Exemplo: 2.32 kg CO2e por Litro de Gasolina
-        'Etanol': 0.00067,      # Exemplo: 0.67 kg CO2e por Litro de Etanol
-    }
-    return fatores
+    return (registro or obter_registro()).fatores_emissao
 
-def calcular_emissao(df, tipo_combustivel=None):
+def calcular_emissao(df, tipo_combustivel=None, registro=None):
     """
     Calcula as emissões totais (em tCO2e) por viagem usando o consumo de combustível.
     
@@ -46,13 +233,14 @@ def calcular_emissao(df, tipo_combustivel=None):
         df: DataFrame com colunas 'Tipo_Combustivel' e 'Combustivel_L', ou um número (int/float)
         tipo_combustivel (str, opcional): Tipo de combustível necessário quando 'df' é um número.
                                          Deve ser 'Diesel S10', 'Gasolina' ou 'Etanol'
+        registro (RegistroFatores, opcional): Fatores a usar. Se omitido, usa o registro padrão.
     
     Returns:
         DataFrame: Se a entrada for DataFrame, retorna DataFrame com colunas adicionais
         float: Se a entrada for número, retorna a emissão calculada em tCO2e
     """
     # 1. Obter os fatores de emissão
-    fatores_emissao = definir_fatores_emissao()
+    fatores_emissao = definir_fatores_emissao(registro)
     
     # 2. Verificar se a entrada é um número (int ou float)
     if isinstance(df, (int, float)):
@@ -74,7 +262,16 @@ def calcular_emissao(df, tipo_combustivel=None):
     # 3. Modo DataFrame: Processamento em lote (lógica original)
     elif isinstance(df, pd.DataFrame):
         # Mapear o Fator de Emissão para cada linha do DataFrame
-        df['Fator_Emissao'] = df['Tipo_Combustivel'].map(fatores_emissao)
+        combustivel = df['Tipo_Combustivel']
+        if isinstance(combustivel.dtype, pd.CategoricalDtype):
+            # Tipo compacto: consulta o fator pelo código da categoria, sem comparar strings.
+            # O código -1 (valor ausente) aponta para o NaN acrescentado ao final.
+            fatores_por_codigo = np.array(
+                [fatores_emissao.get(categoria, np.nan) for categoria in combustivel.cat.categories] + [np.nan]
+            )
+            df['Fator_Emissao'] = fatores_por_codigo[combustivel.cat.codes.to_numpy()]
+        else:
+            df['Fator_Emissao'] = combustivel.map(fatores_emissao)
         
         # Aplicar a fórmula fundamental: Emissão Base = Litros * Fator_Combustível
         df['emissao_base'] = df['Combustivel_L'] * df['Fator_Emissao']
@@ -89,7 +286,7 @@ def calcular_emissao(df, tipo_combustivel=None):
                        f"Esperado: DataFrame, int ou float")
 
 
-def calcular_fator_idade(df):
+def calcular_fator_idade(df, ano_atual=None, registro=None):
     """
     Calcula o fator de idade do veículo usando penalidade progressiva por blocos de ano de fabricação.
     Também calcula a idade do veículo e emissões finais.
@@ -103,84 +300,312 @@ def calcular_fator_idade(df):
     - 5.0% se < 1996
     
     Fórmula: FA = 1.0 + (Ano Atual - Ano Fabricação) × Taxa de Penalidade
-    """
-    ano_atual = datetime.now().year
-    
-    def calcular_taxa_penalidade(ano_fabricacao):
-        """Calcula a taxa de penalidade anual baseada no ano de fabricação."""
-        if ano_fabricacao >= 2023:
-            return 0.01  # 1.0%
-        elif ano_fabricacao >= 2012:
-            return 0.015  # 1.5%
-        elif ano_fabricacao >= 2006:
-            return 0.025  # 2.5%
-        elif ano_fabricacao >= 2000:
-            return 0.03   # 3.0%
-        elif ano_fabricacao >= 1996:
-            return 0.04   # 4.0%
-        else:
-            return 0.05   # 5.0%
     
-    def calcular_fator_ajuste(row):
-        """Calcula o Fator de Ajuste de Idade (FA) para cada veículo."""
-        ano_fabricacao = row['Ano_Fabricacao']
-        idade_veiculo = ano_atual - ano_fabricacao
-        taxa_penalidade = calcular_taxa_penalidade(ano_fabricacao)
-        
-        fator_ajuste = 1.0 + idade_veiculo * taxa_penalidade
-        return fator_ajuste
+    Os blocos vêm do registro de fatores, que já traz o FA pré-calculado por ano de fabricação;
+    aqui o FA de cada linha é apenas consultado na tabela.
     
+    Args:
+        df: DataFrame com a coluna 'Ano_Fabricacao' e 'emissao_base'
+        ano_atual (int, opcional): Ano de referência do cálculo. Se omitido, usa o do registro.
+        registro (RegistroFatores, opcional): Fatores a usar. Se omitido, usa o registro padrão.
+    """
+    registro = resolver_registro(registro, ano_atual)
+    ano_atual = registro.ano_referencia
+    ano_fabricacao = df['Ano_Fabricacao']
+
     # Calcula idade do veículo
-    df['Idade_Veiculo'] = ano_atual - df['Ano_Fabricacao']
+    df['Idade_Veiculo'] = ano_atual - ano_fabricacao
     df['Idade_Veiculo'] = df['Idade_Veiculo'].clip(lower=0)
-    
-    # Aplica o cálculo para cada linha
-    df['Fator_idade'] = df.apply(calcular_fator_ajuste, axis=1)
-    
+
+    # Consulta o FA de cada ano de fabricação na tabela pré-calculada do registro
+    df['Fator_idade'] = registro.fatores_idade(ano_fabricacao)
+
     # Calcula emissao_final = fator_idade * emissao_base
     df['emissao_final'] = df['Fator_idade'] * df['emissao_base']
-    
+
     return df
 
+def dividir_seguro(numerador, denominador):
+    """
+    Divide duas colunas elemento a elemento, retornando 0 onde o denominador for zero.
+    """
+    numerador = np.asarray(numerador, dtype=float)
+    denominador = np.asarray(denominador, dtype=float)
+    return np.divide(numerador, denominador, out=np.zeros_like(numerador), where=denominador != 0)
+
 def calcular_intensidade(df):
     """
     Calcula a intensidade de emissões (tCO2e por tonelada e por km) e eficiência de combustível.
     Trata divisão por zero retornando 0 quando Carga_Ton ou KM_Rodado for zero.
     """
     # Calcula a intensidade por tonelada
-    df['Intensidade_tCO2e_por_Ton'] = df.apply(
-        lambda row: 0 if row['Carga_Ton'] == 0 else row['emissao_final'] / row['Carga_Ton'], 
-        axis=1
-    )
-    
+    df['Intensidade_tCO2e_por_Ton'] = dividir_seguro(df['emissao_final'], df['Carga_Ton'])
+
     # Calcula a intensidade por km rodado
-    df['Intensidade_tCO2e_por_KM'] = df.apply(
-        lambda row: 0 if row['KM_Rodado'] == 0 else row['emissao_final'] / row['KM_Rodado'], 
-        axis=1
-    )
-    
+    df['Intensidade_tCO2e_por_KM'] = dividir_seguro(df['emissao_final'], df['KM_Rodado'])
+
     # Calcula eficiência de combustível (km por litro)
-    df['Eficiencia_KM_por_L'] = df.apply(
-        lambda row: 0 if row['Combustivel_L'] == 0 else row['KM_Rodado'] / row['Combustivel_L'], 
-        axis=1
-    )
+    df['Eficiencia_KM_por_L'] = dividir_seguro(df['KM_Rodado'], df['Combustivel_L'])
     
     return df
 
 def gerar_relatorio_excel(df):
     """
     Gera um relatório em Excel com o DataFrame final (emissões base, final, fator idade e intensidade).
-    Salva o arquivo como 'Relatorio_Carbono_Frota.xlsx' sem incluir o índice das linhas.
+    Salva o arquivo como 'Relatorio_Carbono_Frota.xlsx' sem incluir o índice das linhas, com planilhas
+    de resumo por frota, combustível e mês (ver exportar_excel.ExportadorExcel).
     """
+    from exportar_excel import exportar_excel
     try:
-        # Salva o DataFrame em Excel sem o índice
-        df.to_excel('Relatorio_Carbono_Frota.xlsx', index=False)
-        print(f"\nRelatório salvo com sucesso: Relatorio_Carbono_Frota.xlsx")
+        arquivos = exportar_excel(df, 'Relatorio_Carbono_Frota.xlsx')
+        print(f"\nRelatório salvo com sucesso: {', '.join(arquivos)}")
         print(f"Arquivo contém {df.shape[0]} linhas e {df.shape[1]} colunas")
         
     except Exception as e:
         print(f"Erro ao salvar o relatório Excel: {e}")
 
+# --- Processamento em lotes (streaming) ---
+TAMANHO_LOTE_PADRAO = 100_000
+
+# Colunas exigidas no CSV de viagens (esquema de 'dados_exemplo.csv'; 'Data' é opcional)
+COLUNAS_OBRIGATORIAS = ['ID_Viagem', 'Frota_ID', 'Combustivel_L', 'Tipo_Combustivel',
+                        'KM_Rodado', 'Carga_Ton', 'Numero_Eixos', 'Ano_Fabricacao']
+
+# Colunas somadas nos agregados por frota
+COLUNAS_AGREGADAS = ['Combustivel_L', 'KM_Rodado', 'Carga_Ton', 'emissao_base', 'emissao_final']
+
+def validar_colunas(df):
+    """
+    Verifica se o DataFrame possui todas as colunas obrigatórias do esquema de viagens.
+    
+    Raises:
+        ValueError: Se alguma coluna obrigatória estiver ausente
+    """
+    ausentes = [coluna for coluna in COLUNAS_OBRIGATORIAS if coluna not in df.columns]
+    if ausentes:
+        raise ValueError(f"Colunas obrigatórias ausentes: {ausentes}")
+
+def processar_pipeline(df, ano_atual=None, registro=None):
+    """
+    Executa as três etapas de cálculo (emissão base, fator de idade e intensidade) sobre um DataFrame.
+    """
+    registro = resolver_registro(registro, ano_atual)
+    with cronometrar('pipeline', 'calcular_emissao'):
+        df = calcular_emissao(df, registro=registro)
+    with cronometrar('pipeline', 'calcular_fator_idade'):
+        df = calcular_fator_idade(df, registro=registro)
+    with cronometrar('pipeline', 'calcular_intensidade'):
+        df = calcular_intensidade(df)
+    linhas_processadas.incrementar(quantidade=len(df))
+    return df
+
+def agregar_por_frota(df, chaves='Frota_ID'):
+    """
+    Soma as colunas de consumo e emissão por 'Frota_ID' e conta as viagens de cada frota.
+    
+    'chaves' troca o agrupamento: outra coluna, uma série alinhada ao DataFrame ou uma lista
+    delas (como em DataFrame.groupby), por exemplo para agregar por frota e mês.
+    """
+    grupos = df.groupby(chaves, sort=True, observed=True)
+    agregados = grupos[COLUNAS_AGREGADAS].sum()
+    agregados.insert(0, 'Viagens', grupos.size())
+    return agregados
+
+def combinar_agregados(acumulado, parcial):
+    """
+    Soma dois DataFrames de agregados por frota, mantendo as frotas presentes em apenas um deles.
+    """
+    if acumulado is None:
+        return parcial
+    return acumulado.add(parcial, fill_value=0).sort_index()
+
+def intensidades_agregadas(agregados):
+    """
+    Calcula as intensidades e a eficiência a partir dos totais agregados por frota (ou pelo
+    agrupamento usado em 'agregar_por_frota').
+    """
+    agregados = agregados.copy()
+    agregados['Viagens'] = agregados['Viagens'].astype('int64')
+    agregados['Intensidade_tCO2e_por_Ton'] = dividir_seguro(agregados['emissao_final'], agregados['Carga_Ton'])
+    agregados['Intensidade_tCO2e_por_KM'] = dividir_seguro(agregados['emissao_final'], agregados['KM_Rodado'])
+    agregados['Eficiencia_KM_por_L'] = dividir_seguro(agregados['KM_Rodado'], agregados['Combustivel_L'])
+    return agregados
+
+def resumir_resultados(df):
+    """
+    Calcula os totais de emissão e os agregados por frota de um DataFrame já processado.
+    """
+    return {
+        'viagens': len(df),
+        'emissao_base_total': df['emissao_base'].sum(),
+        'emissao_final_total': df['emissao_final'].sum(),
+        'agregados_frota': intensidades_agregadas(agregar_por_frota(df)),
+    }
+
+def iterar_lotes(origem, tamanho_lote=TAMANHO_LOTE_PADRAO, compacto=False, registro=None, resolvedor_distancias=None):
+    """
+    Lê um CSV de viagens em blocos de 'tamanho_lote' linhas e devolve cada bloco já processado.
+    
+    Se o CSV trouxer as colunas de coordenadas (lat_origem, lng_origem, lat_destino, lng_destino),
+    o KM_Rodado ausente é preenchido por 'distancias.preencher_km_rodado' antes do cálculo.
+    
+    Args:
+        origem: Caminho do arquivo CSV ou objeto de arquivo aberto
+        tamanho_lote (int): Número máximo de linhas mantidas em memória por bloco
+        compacto (bool): Se True, converte cada bloco para os tipos compactos (ver compactar_tipos)
+        registro (RegistroFatores, opcional): Fatores a usar. Se omitido, usa o registro padrão.
+        resolvedor_distancias (ResolvedorDistancias, opcional): Resolve as distâncias a partir das
+            coordenadas. Se omitido, usa o resolvedor padrão (ver distancias.obter_resolvedor).
+    
+    Yields:
+        pandas.DataFrame: Bloco com as colunas calculadas pelas três etapas
+    
+    Raises:
+        ValueError: Se o CSV não tiver as colunas obrigatórias (ver COLUNAS_OBRIGATORIAS)
+    """
+    # Fixa o registro (e o ano de referência) uma única vez para que todos os blocos usem os mesmos fatores
+    registro = resolver_registro(registro)
+    # O leitor é fechado também quando um bloco falha ou a iteração é interrompida
+    with pd.read_csv(origem, encoding='utf-8', chunksize=tamanho_lote) as leitor:
+        while True:
+            with cronometrar('pipeline', 'leitura_lote'):
+                lote = next(leitor, None)
+            if lote is None:
+                return
+            with cronometrar('pipeline', 'preparacao_lote'):
+                lote = preencher_km_rodado(lote, resolvedor_distancias)
+                validar_colunas(lote)
+                if compacto:
+                    lote = compactar_tipos(lote)
+            yield processar_pipeline(lote, registro=registro)
+
+def processar_em_lotes(caminho_entrada, caminho_saida=None, tamanho_lote=TAMANHO_LOTE_PADRAO, compacto=False,
+                       registro=None):
+    """
+    Processa um CSV de viagens maior que a memória disponível, bloco a bloco.
+    
+    Cada bloco passa pelas três etapas de cálculo e é gravado de forma incremental em
+    'caminho_saida', enquanto os totais e os agregados por frota são acumulados. A saída é CSV ou,
+    se terminar em '.xlsx', Excel gravado em memória constante, com planilhas de resumo e novas
+    planilhas de viagens além do limite de linhas do Excel (ver exportar_excel.ExportadorExcel).
+    
+    Returns:
+        dict: 'viagens', 'emissao_base_total', 'emissao_final_total' e 'agregados_frota'
+              (DataFrame indexado por 'Frota_ID')
+    """
+    viagens = 0
+    emissao_base_total = 0.0
+    emissao_final_total = 0.0
+    agregados = None
+    exportador = None
+    if caminho_saida is not None and str(caminho_saida).lower().endswith('.xlsx'):
+        from exportar_excel import ExportadorExcel
+        exportador = ExportadorExcel(caminho_saida)
+
+    try:
+        for numero_lote, lote in enumerate(iterar_lotes(caminho_entrada, tamanho_lote, compacto, registro)):
+            viagens += len(lote)
+            emissao_base_total += lote['emissao_base'].sum()
+            emissao_final_total += lote['emissao_final'].sum()
+            agregados = combinar_agregados(agregados, agregar_por_frota(lote))
+
+            if exportador is not None:
+                exportador.adicionar(lote)
+            elif caminho_saida is not None:
+                # O primeiro bloco cria o arquivo com cabeçalho; os seguintes são anexados
+                lote.to_csv(caminho_saida, mode='w' if numero_lote == 0 else 'a',
+                            header=numero_lote == 0, index=False, encoding='utf-8')
+    except BaseException:
+        # Remove os temporários do Excel parcialmente gravado antes de propagar o erro
+        if exportador is not None:
+            exportador.descartar()
+        raise
+
+    if exportador is not None:
+        exportador.fechar()
+    if agregados is None:
+        agregados = pd.DataFrame(columns=['Viagens'] + COLUNAS_AGREGADAS)
+
+    return {
+        'viagens': viagens,
+        'emissao_base_total': emissao_base_total,
+        'emissao_final_total': emissao_final_total,
+        'agregados_frota': intensidades_agregadas(agregados),
+    }
+
+# --- Processamento paralelo (múltiplos núcleos) ---
+# Abaixo deste número de linhas por processo o custo de serialização supera o ganho do paralelismo
+LINHAS_MINIMAS_POR_PROCESSO = 50_000
+
+def _processar_particao(particao, registro):
+    """Executa o pipeline em uma partição dentro de um processo do pool."""
+    return processar_pipeline(particao, registro=registro)
+
+def _particionar_posicoes(df, n_particoes, particionar_por):
+    """
+    Divide as posições das linhas do DataFrame em até 'n_particoes' grupos.
+    
+    - 'linhas': faixas contíguas de linhas com tamanhos equivalentes
+    - 'frota': cada 'Frota_ID' fica inteiro em uma única partição, distribuindo as frotas
+      (da maior para a menor) sempre para a partição com menos linhas
+    """
+    if particionar_por == 'linhas':
+        return [p for p in np.array_split(np.arange(len(df)), n_particoes) if len(p) > 0]
+
+    if particionar_por == 'frota':
+        grupos = sorted(df.groupby('Frota_ID', sort=True, observed=True, dropna=False).indices.values(),
+                        key=len, reverse=True)
+        particoes = [[] for _ in range(min(n_particoes, len(grupos)))]
+        tamanhos = [0] * len(particoes)
+        for posicoes in grupos:
+            destino = tamanhos.index(min(tamanhos))
+            particoes[destino].append(posicoes)
+            tamanhos[destino] += len(posicoes)
+        return [np.sort(np.concatenate(p)) for p in particoes]
+
+    raise ValueError(f"Modo de particionamento '{particionar_por}' inválido. "
+                     f"Modos disponíveis: ['linhas', 'frota']")
+
+def processar_em_paralelo(df, n_processos=None, particionar_por='linhas', ano_atual=None, registro=None):
+    """
+    Processa um DataFrame de viagens em paralelo usando um pool de processos.
+    
+    O DataFrame é dividido por faixas de linhas ou por 'Frota_ID', cada partição passa pelas três
+    etapas de cálculo em um processo separado e os resultados são recombinados na ordem original
+    das linhas. Totais e agregados são calculados sobre o resultado recombinado, de modo que a
+    saída é idêntica à do processamento serial.
+    
+    Args:
+        df: DataFrame de viagens
+        n_processos (int, opcional): Número de processos. Se omitido, usa todos os núcleos.
+        particionar_por (str): 'linhas' ou 'frota'
+        ano_atual (int, opcional): Ano de referência do fator de idade, fixado para todos os processos
+        registro (RegistroFatores, opcional): Fatores a usar. Se omitido, usa o registro padrão.
+    
+    Returns:
+        dict: 'dados' (DataFrame processado) e os mesmos totais/agregados de 'processar_em_lotes'
+    """
+    # O registro é resolvido uma única vez e enviado a todos os processos
+    registro = resolver_registro(registro, ano_atual)
+    if n_processos is None:
+        n_processos = os.cpu_count() or 1
+    n_processos = max(1, min(n_processos, len(df) // LINHAS_MINIMAS_POR_PROCESSO or 1))
+
+    particoes = _particionar_posicoes(df, n_processos, particionar_por)
+
+    if len(particoes) <= 1:
+        resultado = processar_pipeline(df.copy(), registro=registro)
+    else:
+        with ProcessPoolExecutor(max_workers=len(particoes)) as executor:
+            partes = list(executor.map(_processar_particao,
+                                       [df.iloc[posicoes] for posicoes in particoes],
+                                       [registro] * len(particoes)))
+        # Recoloca as linhas na ordem original do DataFrame de entrada
+        ordem = np.argsort(np.concatenate(particoes), kind='stable')
+        resultado = pd.concat(partes).iloc[ordem]
+
+    return {'dados': resultado, **resumir_resultados(resultado)}
+
 # Exemplo de uso da função
 if __name__ == "__main__":
     # Carrega os dados
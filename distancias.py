@@ -0,0 +1,231 @@
+"""
+Resolução de distâncias rodoviárias (KM_Rodado) a partir de coordenadas de origem e destino.
+
+A distância é obtida de um backend plugável:
+
+- EstimadorHaversine: distância em linha reta (haversine) multiplicada por um fator de sinuosidade
+  das estradas. Funciona offline e é vetorizado com numpy.
+- ServicoRotas: serviço de rotas HTTP no formato do OSRM ('/route/v1/driving/...'). Pode apontar
+  para um servidor público, para um OSRM local ou para um stub em testes.
+
+O ResolvedorDistancias fica na frente do backend. Ele arredonda as coordenadas para formar a
+chave do cache (4 casas ≈ 11 m), deduplica os pares repetidos e consulta os pares ausentes em
+lotes assíncronos concorrentes. Assim, arquivos de viagens que trazem apenas coordenadas recebem
+o KM_Rodado sem uma ida ao navegador por viagem.
+"""
+import asyncio
+import json
+import os
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from cache_lru import CacheLRU
+
+RAIO_TERRA_KM = 6371.0088
+
+# Razão média entre a distância rodoviária e a distância em linha reta (ajustável por ambiente)
+FATOR_ESTRADA_PADRAO = float(os.getenv('DISTANCIAS_FATOR_ESTRADA', '1.3'))
+
+# Casas decimais das coordenadas na chave do cache (4 casas ≈ 11 m no equador)
+CASAS_DECIMAIS_PADRAO = 4
+
+# Colunas de coordenadas esperadas nos arquivos de viagens (mesmos nomes do formulário web)
+COLUNAS_COORDENADAS = ['lat_origem', 'lng_origem', 'lat_destino', 'lng_destino']
+
+
+def distancia_haversine_km(lat_origem, lng_origem, lat_destino, lng_destino):
+    """
+    Distância em linha reta (km) entre pares de coordenadas em graus.
+
+    Aceita escalares ou vetores numpy; vetores são calculados elemento a elemento.
+    """
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=float))
+                              for v in (lat_origem, lng_origem, lat_destino, lng_destino))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class EstimadorHaversine:
+    """Backend offline: distância haversine × fator de estrada."""
+
+    def __init__(self, fator_estrada=FATOR_ESTRADA_PADRAO):
+        self.fator_estrada = fator_estrada
+
+    def estimar(self, pares):
+        """Calcula as distâncias (km) de uma matriz N×4 (lat_o, lng_o, lat_d, lng_d) de uma vez."""
+        pares = np.asarray(pares, dtype=float).reshape(-1, 4)
+        return distancia_haversine_km(*pares.T) * self.fator_estrada
+
+    async def distancias(self, pares):
+        """Retorna a distância (km) de cada par de coordenadas do lote."""
+        return self.estimar(pares).tolist()
+
+
+class ServicoRotas:
+    """
+    Backend HTTP compatível com o serviço de rotas do OSRM.
+
+    Cada par é consultado em '{url_base}/route/v1/driving/{lng_o},{lat_o};{lng_d},{lat_d}'.
+    As requisições rodam em um pool de threads próprio do backend, com 'max_concorrentes'
+    threads: o limite vale para todos os lotes e todas as requisições web que compartilham o
+    backend, e não apenas para uma chamada. Se 'estimador_reserva' for informado, os pares que
+    falharem usam esse estimador; caso contrário, a falha é propagada.
+    """
+
+    def __init__(self, url_base=None, timeout=10.0, max_concorrentes=8, estimador_reserva=None):
+        self.url_base = (url_base or os.getenv('DISTANCIAS_URL', 'https://router.project-osrm.org')).rstrip('/')
+        self.timeout = timeout
+        self.max_concorrentes = max_concorrentes
+        self.estimador_reserva = estimador_reserva
+        # As threads são criadas sob demanda, até 'max_concorrentes'; os pares excedentes esperam na fila
+        self._executor = ThreadPoolExecutor(max_workers=max_concorrentes, thread_name_prefix='rotas')
+
+    def _consultar(self, lat_origem, lng_origem, lat_destino, lng_destino):
+        url = (f"{self.url_base}/route/v1/driving/"
+               f"{lng_origem},{lat_origem};{lng_destino},{lat_destino}?overview=false")
+        with urllib.request.urlopen(url, timeout=self.timeout) as resposta:
+            dados = json.load(resposta)
+        if dados.get('code') != 'Ok' or not dados.get('routes'):
+            raise ValueError(f"Rota não encontrada: {dados.get('code')}")
+        return dados['routes'][0]['distance'] / 1000.0
+
+    async def distancias(self, pares):
+        """Retorna a distância rodoviária (km) de cada par do lote."""
+        loop = asyncio.get_running_loop()
+
+        async def consultar(par):
+            try:
+                return await loop.run_in_executor(self._executor, self._consultar, *par)
+            except Exception:
+                if self.estimador_reserva is None:
+                    raise
+                return float(self.estimador_reserva.estimar([par])[0])
+
+        return list(await asyncio.gather(*(consultar(par) for par in pares)))
+
+
+class ResolvedorDistancias:
+    """Resolve distâncias por par de coordenadas com cache LRU e consultas em lote ao backend."""
+
+    def __init__(self, backend=None, casas_decimais=CASAS_DECIMAIS_PADRAO, tamanho_lote=100,
+                 max_itens_cache=100_000):
+        """
+        Args:
+            backend: Objeto com 'async distancias(pares) -> list[float]'. Padrão: EstimadorHaversine.
+            casas_decimais (int): Arredondamento das coordenadas na chave do cache
+            tamanho_lote (int): Pares enviados ao backend por chamada
+            max_itens_cache (int): Pares mantidos no cache
+        """
+        self.backend = backend or EstimadorHaversine()
+        self.casas_decimais = casas_decimais
+        self.tamanho_lote = tamanho_lote
+        self.cache = CacheLRU(max_itens=max_itens_cache)
+
+    def _chave(self, par):
+        return tuple(round(float(valor), self.casas_decimais) for valor in par)
+
+    async def resolver(self, pares):
+        """
+        Retorna a distância (km) de cada par (lat_o, lng_o, lat_d, lng_d), na ordem recebida.
+
+        Pares que arredondam para a mesma chave são consultados uma única vez; os ausentes do
+        cache são enviados ao backend em lotes de 'tamanho_lote', concorrentemente. O número de
+        consultas simultâneas ao serviço é limitado pelo próprio backend (ver ServicoRotas).
+        """
+        chaves = [self._chave(par) for par in pares]
+        conhecidas = {}
+        pendentes = []
+        for chave in dict.fromkeys(chaves):
+            distancia = self.cache.obter(chave)
+            if distancia is None:
+                pendentes.append(chave)
+            else:
+                conhecidas[chave] = distancia
+
+        lotes = [pendentes[i:i + self.tamanho_lote] for i in range(0, len(pendentes), self.tamanho_lote)]
+        resultados = await asyncio.gather(*(self.backend.distancias(lote) for lote in lotes))
+        for lote, distancias in zip(lotes, resultados):
+            for chave, distancia in zip(lote, distancias):
+                self.cache.definir(chave, distancia)
+                conhecidas[chave] = distancia
+
+        return [conhecidas[chave] for chave in chaves]
+
+    def resolver_sincrono(self, pares):
+        """Versão síncrona de 'resolver', para uso fora de um loop asyncio (Flask, scripts)."""
+        return asyncio.run(self.resolver(pares))
+
+    def distancia(self, lat_origem, lng_origem, lat_destino, lng_destino):
+        """Distância (km) de um único trajeto."""
+        return self.resolver_sincrono([(lat_origem, lng_origem, lat_destino, lng_destino)])[0]
+
+
+def preencher_km_rodado(df, resolvedor=None):
+    """
+    Preenche 'KM_Rodado' das viagens que têm coordenadas e ainda não têm distância.
+
+    Viagens com KM_Rodado informado (> 0) são mantidas. Se o DataFrame não tiver as colunas
+    de coordenadas (ver COLUNAS_COORDENADAS), é devolvido sem alterações.
+
+    Returns:
+        pandas.DataFrame: Cópia do DataFrame com 'KM_Rodado' preenchido
+    """
+    if not all(coluna in df.columns for coluna in COLUNAS_COORDENADAS):
+        return df
+    resolvedor = resolvedor or obter_resolvedor()
+
+    df = df.copy()
+    coordenadas = df[COLUNAS_COORDENADAS].to_numpy(dtype=float)
+    km = df['KM_Rodado'].to_numpy(dtype=float) if 'KM_Rodado' in df.columns else np.full(len(df), np.nan)
+    pendentes = ~(km > 0) & ~np.isnan(coordenadas).any(axis=1)
+
+    if pendentes.any():
+        km = km.copy()
+        km[pendentes] = resolvedor.resolver_sincrono(coordenadas[pendentes].tolist())
+    df['KM_Rodado'] = km
+    return df
+
+
+_resolvedor_padrao = None
+
+
+def obter_resolvedor():
+    """
+    Retorna o resolvedor compartilhado pelo processo.
+
+    Com DISTANCIAS_BACKEND=rotas usa o ServicoRotas (URL em DISTANCIAS_URL), com o
+    estimador haversine como reserva; caso contrário, apenas o estimador haversine.
+    """
+    global _resolvedor_padrao
+    if _resolvedor_padrao is None:
+        if os.getenv('DISTANCIAS_BACKEND', 'haversine') == 'rotas':
+            backend = ServicoRotas(estimador_reserva=EstimadorHaversine())
+        else:
+            backend = EstimadorHaversine()
+        _resolvedor_padrao = ResolvedorDistancias(backend)
+    return _resolvedor_padrao
+
+
+def main():
+    import argparse
+
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description='Preenche KM_Rodado a partir das coordenadas das viagens.')
+    parser.add_argument('entrada', help='CSV com lat_origem, lng_origem, lat_destino e lng_destino')
+    parser.add_argument('saida', help='CSV de saída com KM_Rodado preenchido')
+    args = parser.parse_args()
+
+    viagens = pd.read_csv(args.entrada, encoding='utf-8')
+    faltantes = len(viagens) if 'KM_Rodado' not in viagens.columns else int((~(viagens['KM_Rodado'] > 0)).sum())
+    viagens = preencher_km_rodado(viagens)
+    viagens.to_csv(args.saida, index=False, encoding='utf-8')
+    estatisticas = obter_resolvedor().cache.estatisticas()
+    print(f"✅ {faltantes} viagens sem distância processadas; {estatisticas['itens']} trajetos distintos consultados")
+
+
+if __name__ == '__main__':
+    main()
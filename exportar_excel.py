@@ -0,0 +1,188 @@
+"""
+Exportação das viagens calculadas para Excel em memória constante.
+
+O ExportadorExcel usa o modo 'write_only' do openpyxl: cada linha é gravada em um arquivo
+temporário assim que é recebida, sem manter os objetos de célula em memória. As viagens chegam
+em blocos (por exemplo, de 'iterar_lotes'), e os totais por frota, por combustível e por mês são
+acumulados a cada bloco e gravados em planilhas de resumo ao fechar o arquivo.
+
+Ao atingir o limite de linhas de uma planilha do Excel, as viagens continuam em uma nova planilha
+('Viagens_2', ...) e, se 'max_planilhas_por_arquivo' for informado, em novos arquivos
+('Relatorio_2.xlsx', ...). As planilhas de resumo ficam sempre no primeiro arquivo.
+
+Viagens sem data ou com data inválida entram no resumo mensal com o mês vazio, como nos agregados
+de 'armazem.py'. Se a exportação falhar, os arquivos temporários do openpyxl são removidos.
+"""
+import os
+
+import pandas as pd
+from openpyxl import Workbook
+
+from carbon_calculator import agregar_por_frota, combinar_agregados, intensidades_agregadas
+
+# Limite de linhas de uma planilha do Excel (incluindo o cabeçalho)
+MAX_LINHAS_PLANILHA = 1_048_576
+
+# Linhas convertidas de uma vez ao gravar um DataFrame inteiro com 'exportar_excel'
+TAMANHO_BLOCO_EXPORTACAO = 50_000
+
+# Planilhas de resumo: nome da planilha -> coluna de agrupamento ('mes' é derivado de 'Data')
+RESUMOS = {
+    'Resumo_Frota': 'Frota_ID',
+    'Resumo_Combustivel': 'Tipo_Combustivel',
+    'Resumo_Mes': 'mes',
+}
+
+
+def _linhas(lote):
+    """Linhas do bloco prontas para o openpyxl (valores ausentes viram células vazias)."""
+    lote = lote.astype(object).where(lote.notna(), None)
+    return lote.itertuples(index=False, name=None)
+
+
+class ExportadorExcel:
+    """Grava blocos de viagens calculadas em um ou mais arquivos .xlsx, com planilhas de resumo."""
+
+    def __init__(self, caminho, resumos=True, max_linhas_planilha=MAX_LINHAS_PLANILHA,
+                 max_planilhas_por_arquivo=None):
+        """
+        Args:
+            caminho (str): Arquivo .xlsx de saída (os arquivos extras recebem o sufixo '_2', '_3', ...)
+            resumos (bool): Se True, grava as planilhas de resumo por frota, combustível e mês
+            max_linhas_planilha (int): Linhas por planilha, incluindo o cabeçalho
+            max_planilhas_por_arquivo (int, opcional): Planilhas de viagens por arquivo. None = sem limite.
+        """
+        if max_linhas_planilha < 2:
+            raise ValueError("'max_linhas_planilha' precisa comportar o cabeçalho e ao menos uma viagem")
+        self.caminho = caminho
+        self.max_linhas_planilha = max_linhas_planilha
+        self.max_planilhas_por_arquivo = max_planilhas_por_arquivo
+        self.arquivos = [caminho]
+        self.viagens = 0
+        self._colunas = None
+        self._planilha = None
+        self._linhas_planilha = 0
+        self._planilhas_arquivo = 0
+        self._numero_planilha = 0
+        self._agregados = {nome: None for nome in RESUMOS} if resumos else {}
+
+        # O primeiro arquivo fica aberto até o fim para receber os resumos; as planilhas de resumo
+        # são criadas antes das de viagens para aparecerem primeiro na pasta de trabalho
+        self._pasta_principal = Workbook(write_only=True)
+        self._planilhas_resumo = {nome: self._pasta_principal.create_sheet(nome) for nome in self._agregados}
+        self._pasta = self._pasta_principal
+
+    def _caminho_extra(self, numero):
+        base, extensao = os.path.splitext(self.caminho)
+        return f"{base}_{numero}{extensao}"
+
+    def _nova_planilha(self):
+        if self.max_planilhas_por_arquivo is not None and self._planilhas_arquivo >= self.max_planilhas_por_arquivo:
+            # Arquivo cheio: salva-o (exceto o principal, que ainda receberá os resumos) e abre o próximo
+            if self._pasta is not self._pasta_principal:
+                self._pasta.save(self.arquivos[-1])
+            self.arquivos.append(self._caminho_extra(len(self.arquivos) + 1))
+            self._pasta = Workbook(write_only=True)
+            self._planilhas_arquivo = 0
+
+        self._numero_planilha += 1
+        nome = 'Viagens' if self._numero_planilha == 1 else f'Viagens_{self._numero_planilha}'
+        self._planilha = self._pasta.create_sheet(nome)
+        self._planilha.append(self._colunas)
+        self._linhas_planilha = 1
+        self._planilhas_arquivo += 1
+
+    def adicionar(self, lote):
+        """Grava as viagens do bloco e soma-as aos resumos."""
+        if self._colunas is None:
+            self._colunas = list(lote.columns)
+            self._nova_planilha()
+
+        for linha in _linhas(lote):
+            if self._linhas_planilha >= self.max_linhas_planilha:
+                self._nova_planilha()
+            self._planilha.append(linha)
+            self._linhas_planilha += 1
+        self.viagens += len(lote)
+
+        for nome, coluna in RESUMOS.items():
+            if nome not in self._agregados:
+                continue
+            if coluna == 'mes':
+                if 'Data' not in lote.columns:
+                    continue
+                chave = (pd.to_datetime(lote['Data'].astype(str), errors='coerce')
+                         .dt.strftime('%Y-%m').fillna('').rename('Mes'))
+            else:
+                chave = lote[coluna].astype(str)
+            self._agregados[nome] = combinar_agregados(self._agregados[nome], agregar_por_frota(lote, chave))
+
+    def fechar(self):
+        """Grava as planilhas de resumo e salva os arquivos. Retorna a lista de arquivos gerados."""
+        try:
+            return self._salvar()
+        except BaseException:
+            self.descartar()
+            raise
+
+    def _salvar(self):
+        if self._colunas is None:
+            # Nenhum bloco recebido: grava ao menos uma planilha de viagens vazia
+            self._planilha = self._pasta.create_sheet('Viagens')
+
+        for nome, agregados in self._agregados.items():
+            if agregados is None:
+                # Sem a coluna 'Data' não há resumo mensal
+                self._pasta_principal.remove(self._planilhas_resumo[nome])
+                continue
+            resumo = intensidades_agregadas(agregados).reset_index()
+            planilha = self._planilhas_resumo[nome]
+            planilha.append(list(resumo.columns))
+            for linha in _linhas(resumo):
+                planilha.append(linha)
+
+        if self._pasta is not self._pasta_principal:
+            self._pasta.save(self.arquivos[-1])
+        self._pasta_principal.save(self.caminho)
+        return self.arquivos
+
+    def descartar(self):
+        """
+        Interrompe a exportação sem salvar o arquivo principal: remove os arquivos temporários das
+        planilhas ainda abertas e os arquivos extras já salvos, que ficariam incompletos.
+        """
+        pastas = [self._pasta_principal] + ([self._pasta] if self._pasta is not self._pasta_principal else [])
+        for pasta in pastas:
+            for planilha in pasta.worksheets:
+                escritor = planilha._writer
+                if escritor is None or not os.path.exists(escritor.out):
+                    continue
+                if not planilha.closed:
+                    planilha.close()
+                escritor.cleanup()
+        for caminho in self.arquivos[1:-1]:
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_excecao, *exc):
+        if tipo_excecao is None:
+            self.fechar()
+        else:
+            self.descartar()
+
+
+def exportar_excel(df, caminho, resumos=True, **opcoes):
+    """
+    Grava um DataFrame de viagens com o ExportadorExcel, bloco a bloco.
+
+    Returns:
+        list: Arquivos gerados (mais de um apenas quando 'max_planilhas_por_arquivo' é atingido)
+    """
+    with ExportadorExcel(caminho, resumos=resumos, **opcoes) as exportador:
+        # Um DataFrame vazio ainda gera a planilha com o cabeçalho
+        for inicio in range(0, max(len(df), 1), TAMANHO_BLOCO_EXPORTACAO):
+            exportador.adicionar(df.iloc[inicio:inicio + TAMANHO_BLOCO_EXPORTACAO])
+    return exportador.arquivos
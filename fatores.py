@@ -0,0 +1,234 @@
+"""
+Registro de fatores de emissão e de penalidade por idade do Carbon Log.
+
+O registro carrega uma única vez os fatores de emissão (tCO2e/L) e os blocos de penalidade
+anual por ano de fabricação, a partir do código ou de um arquivo JSON versionado (veja
+'fatores_emissao.example.json'), e pré-calcula uma tabela densa do Fator de Ajuste de Idade
+indexada pelo ano de fabricação para um ano de referência explícito. Assim, o cálculo em lote
+e o cálculo individual consultam o fator de idade em O(1).
+
+Este módulo depende apenas de numpy, para que o cálculo individual não precise carregar o pandas.
+"""
+import json
+import math
+import os
+from datetime import datetime
+from functools import lru_cache
+from types import MappingProxyType
+
+import numpy as np
+
+# Fatores baseados em referências como GHG Protocol Brasil (adaptado para fins didáticos), em tCO2e/L
+FATORES_EMISSAO_PADRAO = {
+    'Diesel S10': 0.002671,  # 2.671 kg CO2e por Litro de Diesel
+    'Gasolina': 0.00232,    # Exemplo: 2.32 kg CO2e por Litro de Gasolina
+    'Etanol': 0.00067,      # Exemplo: 0.67 kg CO2e por Litro de Etanol
+}
+
+# Blocos de penalidade anual por ano de fabricação: (ano mínimo, taxa).
+# Ordenados do mais recente para o mais antigo; anos abaixo do último bloco usam TAXA_PENALIDADE_MINIMA.
+FAIXAS_PENALIDADE = [
+    (2023, 0.01),   # 1.0%
+    (2012, 0.015),  # 1.5%
+    (2006, 0.025),  # 2.5%
+    (2000, 0.03),   # 3.0%
+    (1996, 0.04),   # 4.0%
+]
+TAXA_PENALIDADE_MINIMA = 0.05  # 5.0%
+
+VERSAO_PADRAO = 'ghg-br-didatico-v1'
+
+# Faixa de anos de fabricação coberta pela tabela pré-calculada (em relação ao ano de referência).
+# Anos fora dela continuam corretos, apenas calculados em vez de consultados.
+ANO_INICIAL_TABELA = 1900
+ANOS_FUTUROS_TABELA = 10
+
+# Arquivo de fatores usado pelo registro padrão, se definido
+VARIAVEL_ARQUIVO_FATORES = 'FATORES_EMISSAO_ARQUIVO'
+
+
+class RegistroFatores:
+    """Fatores de emissão e blocos de penalidade por idade, com tabela de fator de idade pré-calculada."""
+
+    def __init__(self, fatores_emissao=None, faixas_penalidade=None,
+                 taxa_penalidade_minima=TAXA_PENALIDADE_MINIMA, versao=VERSAO_PADRAO, ano_referencia=None):
+        """
+        Args:
+            fatores_emissao (dict, opcional): Fator (tCO2e/L) por tipo de combustível
+            faixas_penalidade (list, opcional): Blocos (ano mínimo, taxa anual)
+            taxa_penalidade_minima (float): Taxa dos anos abaixo do último bloco
+            versao (str): Identificador do conjunto de fatores
+            ano_referencia (int, opcional): Ano usado no cálculo da idade. Se omitido, usa o ano corrente.
+        """
+        self._fatores_emissao = dict(fatores_emissao or FATORES_EMISSAO_PADRAO)
+        faixas = faixas_penalidade if faixas_penalidade is not None else FAIXAS_PENALIDADE
+        self.faixas_penalidade = tuple(
+            sorted(((int(ano), float(taxa)) for ano, taxa in faixas), reverse=True)
+        )
+        self.taxa_penalidade_minima = float(taxa_penalidade_minima)
+        self.versao = versao
+        self.ano_referencia = int(ano_referencia if ano_referencia is not None else datetime.now().year)
+
+        # Tabela densa: posição i corresponde ao ano de fabricação ANO_INICIAL_TABELA + i
+        anos = range(ANO_INICIAL_TABELA, self.ano_referencia + ANOS_FUTUROS_TABELA + 1)
+        self._fatores_idade = [self._calcular_fator_idade(ano) for ano in anos]
+        self._tabela_fatores_idade = np.array(self._fatores_idade)
+
+    @classmethod
+    def de_arquivo(cls, caminho, ano_referencia=None):
+        """
+        Carrega o registro de um arquivo JSON com as chaves 'versao', 'fatores_emissao',
+        'faixas_penalidade' (lista de [ano mínimo, taxa]) e 'taxa_penalidade_minima'.
+        """
+        with open(caminho, encoding='utf-8') as arquivo:
+            config = json.load(arquivo)
+        return cls(
+            fatores_emissao=config['fatores_emissao'],
+            faixas_penalidade=config.get('faixas_penalidade', FAIXAS_PENALIDADE),
+            taxa_penalidade_minima=config.get('taxa_penalidade_minima', TAXA_PENALIDADE_MINIMA),
+            versao=config.get('versao', os.path.basename(caminho)),
+            ano_referencia=ano_referencia,
+        )
+
+    def com_ano_referencia(self, ano_referencia):
+        """Retorna um registro com os mesmos fatores e outro ano de referência."""
+        if int(ano_referencia) == self.ano_referencia:
+            return self
+        return RegistroFatores(self.fatores_emissao, self.faixas_penalidade, self.taxa_penalidade_minima,
+                               self.versao, ano_referencia)
+
+    @property
+    def fatores_emissao(self):
+        """Fator de emissão (tCO2e/L) por tipo de combustível, somente leitura."""
+        return MappingProxyType(self._fatores_emissao)
+
+    @property
+    def chave(self):
+        """Identifica o resultado dos cálculos: versão dos fatores e ano de referência."""
+        return (self.versao, self.ano_referencia)
+
+    def taxa_penalidade(self, ano_fabricacao):
+        """Retorna a taxa de penalidade anual do bloco ao qual o ano de fabricação pertence."""
+        for ano_minimo, taxa in self.faixas_penalidade:
+            if ano_fabricacao >= ano_minimo:
+                return taxa
+        return self.taxa_penalidade_minima
+
+    def _calcular_fator_idade(self, ano_fabricacao):
+        # FA = 1.0 + (Ano Atual - Ano Fabricação) × Taxa de Penalidade
+        return 1.0 + (self.ano_referencia - ano_fabricacao) * self.taxa_penalidade(ano_fabricacao)
+
+    def fator_idade(self, ano_fabricacao):
+        """Retorna o Fator de Ajuste de Idade de um ano de fabricação (consulta à tabela)."""
+        indice = ano_fabricacao - ANO_INICIAL_TABELA
+        if 0 <= indice < len(self._fatores_idade) and indice == int(indice):
+            return self._fatores_idade[int(indice)]
+        return self._calcular_fator_idade(ano_fabricacao)
+
+    def fatores_idade(self, anos_fabricacao):
+        """
+        Retorna o Fator de Ajuste de Idade de um vetor de anos de fabricação.
+
+        Anos inteiros dentro da tabela são consultados diretamente; os demais (fora da faixa,
+        fracionários ou ausentes) são calculados pelos blocos, com o mesmo resultado.
+        """
+        anos = np.asarray(anos_fabricacao, dtype=float)
+        indices = anos - ANO_INICIAL_TABELA
+        na_tabela = (indices >= 0) & (indices < len(self._fatores_idade)) & (indices == np.floor(indices))
+
+        fatores = np.empty(anos.shape)
+        fatores[na_tabela] = self._tabela_fatores_idade[indices[na_tabela].astype(np.intp)]
+
+        fora = ~na_tabela
+        if fora.any():
+            anos_fora = anos[fora]
+            taxas = np.select(
+                [anos_fora >= ano_minimo for ano_minimo, _ in self.faixas_penalidade],
+                [taxa for _, taxa in self.faixas_penalidade],
+                default=self.taxa_penalidade_minima,
+            )
+            fatores[fora] = 1.0 + (self.ano_referencia - anos_fora) * taxas
+        return fatores
+
+    def __repr__(self):
+        return f"RegistroFatores(versao={self.versao!r}, ano_referencia={self.ano_referencia})"
+
+
+@lru_cache(maxsize=8)
+def _registro_padrao(ano_referencia, caminho_arquivo):
+    if caminho_arquivo:
+        return RegistroFatores.de_arquivo(caminho_arquivo, ano_referencia)
+    return RegistroFatores(ano_referencia=ano_referencia)
+
+
+def obter_registro(ano_referencia=None):
+    """
+    Retorna o registro padrão (construído uma vez por ano de referência).
+
+    Se a variável de ambiente FATORES_EMISSAO_ARQUIVO estiver definida, os fatores são lidos
+    desse arquivo JSON; caso contrário, são usados os fatores definidos neste módulo.
+    """
+    if ano_referencia is None:
+        ano_referencia = datetime.now().year
+    return _registro_padrao(int(ano_referencia), os.getenv(VARIAVEL_ARQUIVO_FATORES) or None)
+
+
+def resolver_registro(registro=None, ano_referencia=None):
+    """Retorna 'registro' (ou o registro padrão) ajustado para 'ano_referencia', quando informado."""
+    if registro is None:
+        return obter_registro(ano_referencia)
+    if ano_referencia is not None:
+        return registro.com_ano_referencia(ano_referencia)
+    return registro
+
+
+def _dividir_seguro_escalar(numerador, denominador):
+    """Divisão escalar que retorna 0.0 quando o denominador for zero."""
+    return 0.0 if denominador == 0 else numerador / denominador
+
+
+def calcular_viagem(combustivel_l, tipo_combustivel, km_rodado=0.0, carga_ton=0.0,
+                    ano_fabricacao=None, ano_atual=None, registro=None):
+    """
+    Calcula uma única viagem em Python puro, sem construir um DataFrame.
+
+    Usa o mesmo registro de fatores das funções em lote e produz os mesmos valores que
+    'calcular_emissao' → 'calcular_fator_idade' → 'calcular_intensidade' aplicados a um
+    DataFrame de uma linha (inclusive emissão 0 para combustível desconhecido ou litros ausentes).
+
+    Args:
+        combustivel_l (float): Litros consumidos
+        tipo_combustivel (str): 'Diesel S10', 'Gasolina' ou 'Etanol'
+        km_rodado (float): Quilômetros rodados
+        carga_ton (float): Carga transportada em toneladas
+        ano_fabricacao (int, opcional): Ano de fabricação. Se omitido, usa o ano de referência (fator 1.0).
+        ano_atual (int, opcional): Ano de referência do cálculo. Se omitido, usa o do registro.
+        registro (RegistroFatores, opcional): Fatores a usar. Se omitido, usa o registro padrão.
+
+    Returns:
+        dict: Valores calculados, com as mesmas chaves das colunas geradas no modo DataFrame
+    """
+    registro = resolver_registro(registro, ano_atual)
+    ano_atual = registro.ano_referencia
+    if ano_fabricacao is None:
+        ano_fabricacao = ano_atual
+
+    fator_emissao = registro.fatores_emissao.get(tipo_combustivel)
+    emissao_base = 0.0 if fator_emissao is None else combustivel_l * fator_emissao
+    if math.isnan(emissao_base):
+        # Como no modo DataFrame, emissão indeterminada (litros ausentes) conta como zero
+        emissao_base = 0.0
+
+    fator_idade = registro.fator_idade(ano_fabricacao)
+    emissao_final = fator_idade * emissao_base
+
+    return {
+        'Fator_Emissao': fator_emissao,
+        'emissao_base': emissao_base,
+        'Idade_Veiculo': max(ano_atual - ano_fabricacao, 0),
+        'Fator_idade': fator_idade,
+        'emissao_final': emissao_final,
+        'Intensidade_tCO2e_por_Ton': _dividir_seguro_escalar(emissao_final, carga_ton),
+        'Intensidade_tCO2e_por_KM': _dividir_seguro_escalar(emissao_final, km_rodado),
+        'Eficiencia_KM_por_L': _dividir_seguro_escalar(km_rodado, combustivel_l),
+    }
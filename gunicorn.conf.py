@@ -0,0 +1,33 @@
+"""
+Configuração do gunicorn (lida automaticamente de ./gunicorn.conf.py ou com '-c gunicorn.conf.py').
+
+Os workers são 'gthread': cada processo atende várias requisições em threads. Uma requisição
+que espera E/S (serviço de rotas, SQLite, envio de um PDF) ocupa uma thread, não o worker inteiro.
+O trabalho pesado continua limitado dentro da aplicação: os PDFs são gerados por um pool fixo de
+threads com fila limitada (relatorio_pdf) e os envios em lote simultâneos são limitados por
+LOTES_SIMULTANEOS (app.py).
+
+O padrão é um único worker; mais de um exige RELATORIOS_DIR (veja "Relatórios PDF" no README).
+
+Variáveis de ambiente:
+    WEB_CONCURRENCY (padrão 1)       - processos worker (mais de um exige RELATORIOS_DIR)
+    GUNICORN_THREADS (padrão 16)     - threads por worker
+    GUNICORN_WORKER_CLASS            - 'gthread' (padrão) ou 'sync' (um pedido por worker)
+    GUNICORN_TIMEOUT (padrão 60)     - segundos até reiniciar um worker travado
+    PRE_CARREGAR=1                   - carrega a aplicação no processo mestre (--preload)
+"""
+import os
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+preload_app = os.getenv('PRE_CARREGAR', '').lower() in ('1', 'true', 'sim')
+
+
+def on_starting(server):
+    # 'workers' pode ter sido trocado na linha de comando (-w); o valor efetivo está em server.cfg
+    if server.cfg.workers > 1 and not os.getenv('RELATORIOS_DIR'):
+        server.log.warning(
+            "%d workers sem RELATORIOS_DIR: defina RELATORIOS_DIR ou use WEB_CONCURRENCY=1 "
+            "(veja \"Relatórios PDF\" no README).", server.cfg.workers)
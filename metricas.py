@@ -0,0 +1,176 @@
+"""
+Métricas de desempenho do Carbon Log (contadores e histogramas de tempo por etapa).
+
+Os histogramas têm limites fixos: cada observação custa uma busca binária e um incremento sob
+um lock, sem guardar as amostras. Os valores são exportados no formato de texto do Prometheus
+pela rota /metrics da aplicação web.
+
+As métricas ficam na memória do processo. Com vários workers do gunicorn, cada worker expõe as
+suas; o mesmo vale para as partições de 'processar_em_paralelo', cujas etapas rodam em processos
+separados e não são somadas ao processo principal.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Limites (em segundos) dos histogramas de tempo: de 0,1 ms a 30 s
+LIMITES_TEMPO_PADRAO = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                        2.5, 5.0, 10.0, 30.0)
+
+
+def _formatar_rotulos(nomes, valores, extra=None):
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra is not None:
+        pares.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    """Contador monotônico, separado pelos valores dos rótulos."""
+
+    tipo = 'counter'
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._valores = {}  # valores dos rótulos -> total
+        self._lock = threading.Lock()
+
+    def incrementar(self, *valores_rotulos, quantidade=1):
+        """Soma 'quantidade' ao contador dos rótulos informados (na ordem de 'rotulos')."""
+        with self._lock:
+            self._valores[valores_rotulos] = self._valores.get(valores_rotulos, 0) + quantidade
+
+    def valor(self, *valores_rotulos):
+        with self._lock:
+            return self._valores.get(valores_rotulos, 0)
+
+    def exportar(self):
+        """Linhas das séries do contador no formato de texto do Prometheus."""
+        with self._lock:
+            itens = sorted(self._valores.items())
+        return [f'{self.nome}{_formatar_rotulos(self.rotulos, valores)} {_formatar_numero(total)}'
+                for valores, total in itens]
+
+
+class Histograma:
+    """Histograma com limites fixos, separado pelos valores dos rótulos."""
+
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, rotulos=(), limites=LIMITES_TEMPO_PADRAO):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.limites = tuple(sorted(limites))
+        self._series = {}  # valores dos rótulos -> [contagens por faixa (+Inf no fim), soma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *valores_rotulos):
+        """Registra uma observação nas séries dos rótulos informados (na ordem de 'rotulos')."""
+        faixa = bisect_left(self.limites, valor)
+        with self._lock:
+            serie = self._series.get(valores_rotulos)
+            if serie is None:
+                serie = self._series[valores_rotulos] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            serie[0][faixa] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def resumo(self, *valores_rotulos):
+        """Retorna {'total', 'soma'} da série dos rótulos informados."""
+        with self._lock:
+            serie = self._series.get(valores_rotulos)
+            return {'total': serie[2], 'soma': serie[1]} if serie else {'total': 0, 'soma': 0.0}
+
+    def exportar(self):
+        """Linhas das séries do histograma (faixas acumuladas, soma e total) no formato do Prometheus."""
+        with self._lock:
+            itens = sorted((valores, [list(serie[0]), serie[1], serie[2]]) for valores, serie in self._series.items())
+        linhas = []
+        for valores, (contagens, soma, total) in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.limites + (float('inf'),), contagens):
+                acumulado += contagem
+                le = '+Inf' if limite == float('inf') else _formatar_numero(float(limite))
+                linhas.append(f'{self.nome}_bucket{_formatar_rotulos(self.rotulos, valores, ("le", le))} {acumulado}')
+            linhas.append(f'{self.nome}_sum{_formatar_rotulos(self.rotulos, valores)} {_formatar_numero(soma)}')
+            linhas.append(f'{self.nome}_count{_formatar_rotulos(self.rotulos, valores)} {total}')
+        return linhas
+
+
+class RegistroMetricas:
+    """Conjunto nomeado de contadores e histogramas, exportado em conjunto."""
+
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, classe, nome, ajuda, **opcoes):
+        with self._lock:
+            metrica = self._metricas.get(nome)
+            if metrica is None:
+                metrica = self._metricas[nome] = classe(nome, ajuda, **opcoes)
+            elif not isinstance(metrica, classe):
+                raise ValueError(f"A métrica '{nome}' já foi registrada como {metrica.tipo}")
+            return metrica
+
+    def contador(self, nome, ajuda, rotulos=()):
+        """Retorna o contador 'nome', criando-o no primeiro uso."""
+        return self._registrar(Contador, nome, ajuda, rotulos=rotulos)
+
+    def histograma(self, nome, ajuda, rotulos=(), limites=LIMITES_TEMPO_PADRAO):
+        """Retorna o histograma 'nome', criando-o no primeiro uso."""
+        return self._registrar(Histograma, nome, ajuda, rotulos=rotulos, limites=limites)
+
+    def exportar_prometheus(self):
+        """Texto de todas as métricas no formato de exposição do Prometheus (versão 0.0.4)."""
+        with self._lock:
+            metricas = sorted(self._metricas.values(), key=lambda metrica: metrica.nome)
+        linhas = []
+        for metrica in metricas:
+            linhas.append(f'# HELP {metrica.nome} {metrica.ajuda}')
+            linhas.append(f'# TYPE {metrica.nome} {metrica.tipo}')
+            linhas.extend(metrica.exportar())
+        return '\n'.join(linhas) + '\n'
+
+
+# Registro usado pela aplicação, pelo pipeline de cálculo e pelos relatórios
+registro_metricas = RegistroMetricas()
+
+tempo_etapas = registro_metricas.histograma(
+    'carbonlog_etapa_segundos', 'Tempo gasto em cada etapa, por fluxo (rota ou pipeline)', rotulos=('fluxo', 'etapa'))
+erros_etapas = registro_metricas.contador(
+    'carbonlog_etapa_erros_total', 'Etapas interrompidas por exceção, por fluxo e tipo de erro',
+    rotulos=('fluxo', 'etapa', 'erro'))
+
+
+@contextmanager
+def cronometrar(fluxo, etapa, destino=None):
+    """
+    Mede o tempo do bloco e o registra no histograma de etapas ('fluxo', 'etapa').
+
+    Exceções são contadas por tipo e propagadas. Se 'destino' (dict) for informado, o tempo
+    em segundos também é gravado em destino[etapa], para o log estruturado da requisição.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    except BaseException as erro:
+        erros_etapas.incrementar(fluxo, etapa, type(erro).__name__)
+        raise
+    finally:
+        duracao = time.perf_counter() - inicio
+        tempo_etapas.observar(duracao, fluxo, etapa)
+        if destino is not None:
+            destino[etapa] = duracao
@@ -0,0 +1,264 @@
+"""
+Relatórios PDF consolidados por frota (ou veículo) e período.
+
+Recebe o DataFrame já enriquecido pelo pipeline de 'carbon_calculator' (colunas de emissão e
+intensidade), agrupa as viagens por 'Frota_ID' e por mês (ou ano) e gera um PDF de várias páginas
+por grupo, com os totais do período, um resumo por combustível e a lista das viagens.
+
+Os totais e resumos são calculados de uma vez com groupby; os documentos são renderizados em um
+pool de processos, cada um reaproveitando os estilos do ReportLab de 'relatorio_pdf', construídos
+uma única vez por processo.
+
+Uso:
+    python relatorio_frota.py viagens.csv relatorios/ [--periodo mes] [--processos N]
+"""
+import argparse
+import hashlib
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from carbon_calculator import agregar_por_frota, carregar_dados, intensidades_agregadas, processar_pipeline
+from metricas import cronometrar
+from relatorio_pdf import obter_estilos
+
+# Formatos (strftime) dos períodos de agrupamento; None gera um único documento por grupo
+PERIODOS = {
+    'mes': '%Y-%m',
+    'ano': '%Y',
+    None: None,
+}
+
+# Período das viagens sem data ou com data inválida, para que nenhuma fique fora dos relatórios
+PERIODO_SEM_DATA = 'sem data'
+
+# Abaixo deste número de documentos por processo a renderização é feita no processo atual
+DOCUMENTOS_MINIMOS_POR_PROCESSO = 8
+
+# Colunas da lista de viagens: coluna do DataFrame -> (título, formato)
+COLUNAS_DETALHE = {
+    'ID_Viagem': ('Viagem', '{}'),
+    'Data': ('Data', '{}'),
+    'Tipo_Combustivel': ('Combustível', '{}'),
+    'KM_Rodado': ('km', '{:.0f}'),
+    'Combustivel_L': ('Litros', '{:.1f}'),
+    'Carga_Ton': ('Carga (t)', '{:.1f}'),
+    'emissao_final': ('tCO2e', '{:.4f}'),
+    'Intensidade_tCO2e_por_KM': ('tCO2e/km', '{:.6f}'),
+}
+
+ESTILO_TABELA_DETALHE = TableStyle(
+    [
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#f0f7f5")),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ("ALIGN", (3, 1), (-1, -1), "RIGHT"),
+        ("INNERGRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#d4e5e1")),
+        ("BOX", (0, 0), (-1, -1), 0.25, colors.HexColor("#d4e5e1")),
+    ]
+)
+
+
+def _nome_arquivo(grupo, periodo, desambiguar=False):
+    """
+    Nome do PDF de um grupo/período, apenas com caracteres seguros em nomes de arquivo.
+
+    Com 'desambiguar', acrescenta um trecho do hash do grupo/período original, para separar
+    grupos diferentes que viram o mesmo nome (ex.: 'A/B' e 'A-B').
+    """
+    partes = [str(grupo)] + ([str(periodo)] if periodo is not None else [])
+    nome = 'Relatorio_Frota_' + re.sub(r'[^A-Za-z0-9_-]+', '-', '_'.join(partes))
+    if desambiguar:
+        nome += '_' + hashlib.sha256('\0'.join(partes).encode('utf-8')).hexdigest()[:8]
+    return nome + '.pdf'
+
+
+def _nomes_arquivos(resumos):
+    """Nomes dos PDFs dos resumos, desambiguando os grupos cujos nomes coincidiriam."""
+    nomes = [_nome_arquivo(resumo['grupo'], resumo['periodo']) for resumo in resumos]
+    repetidos = {nome for nome, ocorrencias in Counter(nomes).items() if ocorrencias > 1}
+    return [_nome_arquivo(resumo['grupo'], resumo['periodo'], desambiguar=True) if nome in repetidos else nome
+            for resumo, nome in zip(resumos, nomes)]
+
+
+def montar_resumos(df, agrupar_por='Frota_ID', periodo='mes'):
+    """
+    Agrupa as viagens calculadas e monta o conteúdo de cada relatório.
+
+    Args:
+        df: DataFrame enriquecido por 'processar_pipeline'
+        agrupar_por (str): Coluna que identifica a frota ou o veículo
+        periodo (str, opcional): 'mes', 'ano' ou None (todo o histórico em um documento)
+
+    Returns:
+        list[dict]: Um resumo por grupo/período, com 'grupo', 'periodo', 'totais',
+                    'combustiveis' e 'viagens' (linhas já formatadas). Viagens sem data válida
+                    ficam no período PERIODO_SEM_DATA.
+
+    Raises:
+        ValueError: Se o período for inválido ou o DataFrame não tiver passado pelo pipeline
+    """
+    if periodo not in PERIODOS:
+        raise ValueError(f"Período '{periodo}' inválido. Períodos disponíveis: {list(PERIODOS)}")
+    if 'emissao_final' not in df.columns:
+        raise ValueError("O DataFrame precisa ter passado pelo pipeline de cálculo (coluna 'emissao_final' ausente)")
+
+    chaves = [df[agrupar_por].astype(str).rename('grupo')]
+    if periodo is not None:
+        datas = pd.to_datetime(df['Data'].astype(str), errors='coerce')
+        chaves.append(datas.dt.strftime(PERIODOS[periodo]).fillna(PERIODO_SEM_DATA).rename('periodo'))
+
+    totais = intensidades_agregadas(agregar_por_frota(df, chaves))
+
+    combustiveis = (df.groupby(chaves + [df['Tipo_Combustivel'].astype(str)], sort=True, observed=True)
+                    .agg(Viagens=('emissao_final', 'size'), Combustivel_L=('Combustivel_L', 'sum'),
+                         emissao_final=('emissao_final', 'sum')))
+    nomes_chaves = [chave.name for chave in chaves]
+    combustiveis_por_grupo = {chave: parte
+                              for chave, parte in combustiveis.reset_index(level='Tipo_Combustivel')
+                              .groupby(nomes_chaves, sort=False)}
+
+    detalhe = df[list(COLUNAS_DETALHE)]
+    resumos = []
+    for chave, posicoes in df.groupby(chaves, sort=True, observed=True).indices.items():
+        chave = chave if isinstance(chave, tuple) else (chave,)
+        viagens = detalhe.iloc[posicoes]
+        resumos.append({
+            'grupo': chave[0],
+            'periodo': chave[1] if periodo is not None else None,
+            'totais': totais.loc[chave if len(chave) > 1 else chave[0]].to_dict(),
+            'combustiveis': list(combustiveis_por_grupo[chave].itertuples(index=False, name=None)),
+            'viagens': [[formato.format(valor) for (_, formato), valor in zip(COLUNAS_DETALHE.values(), linha)]
+                        for linha in viagens.itertuples(index=False, name=None)],
+        })
+    return resumos
+
+
+def gerar_relatorio_frota_pdf(resumo, destino):
+    """
+    Gera o PDF consolidado de um grupo/período montado por 'montar_resumos'.
+
+    'destino' pode ser o caminho de um arquivo ou um buffer binário (ex.: io.BytesIO).
+    """
+    rotulo = resumo['grupo'] if resumo['periodo'] is None else f"{resumo['grupo']} — {resumo['periodo']}"
+    doc = SimpleDocTemplate(destino, pagesize=A4, title=f"Relatório de Emissões da Frota {rotulo} - Carbon Log")
+    totais = resumo['totais']
+    estilos = obter_estilos()
+
+    story = [
+        Paragraph(f"Relatório de Emissões de GEE — Frota {resumo['grupo']}", estilos["titulo"]),
+        Paragraph(f"Carbon Log — período: {resumo['periodo'] or 'todo o histórico'}", estilos["subtitulo"]),
+        Paragraph(f"Emissão total do período: <b>{totais['emissao_final']:.4f} tCO2e</b> "
+                  f"em {int(totais['Viagens'])} viagens", estilos["corpo"]),
+        Spacer(1, 12),
+        Paragraph("Totais do período", estilos["secao_titulo"]),
+    ]
+
+    tabela_totais = Table([
+        ["Indicador", "Valor"],
+        ["Viagens", f"{int(totais['Viagens'])}"],
+        ["Litros consumidos", f"{totais['Combustivel_L']:.1f} L"],
+        ["Quilômetros rodados", f"{totais['KM_Rodado']:.0f} km"],
+        ["Carga transportada (t)", f"{totais['Carga_Ton']:.1f}"],
+        ["Emissão base (tCO2e)", f"{totais['emissao_base']:.4f}"],
+        ["Emissão final (tCO2e)", f"{totais['emissao_final']:.4f}"],
+        ["Emissão por km (tCO2e/km)", f"{totais['Intensidade_tCO2e_por_KM']:.6f}"],
+        ["Intensidade por tonelada (tCO2e/ton)", f"{totais['Intensidade_tCO2e_por_Ton']:.6f}"],
+        ["Eficiência (km/L)", f"{totais['Eficiencia_KM_por_L']:.2f}"],
+    ], colWidths=[220, 290])
+    tabela_totais.setStyle(estilos["tabela_resultados"])
+    story += [tabela_totais, Spacer(1, 12), Paragraph("Resumo por combustível", estilos["secao_titulo"])]
+
+    tabela_combustiveis = Table(
+        [["Combustível", "Viagens", "Litros", "Emissão final (tCO2e)"]]
+        + [[combustivel, f"{viagens}", f"{litros:.1f}", f"{emissao:.4f}"]
+           for combustivel, viagens, litros, emissao in resumo['combustiveis']],
+        colWidths=[150, 90, 120, 150],
+    )
+    tabela_combustiveis.setStyle(ESTILO_TABELA_DETALHE)
+    story += [tabela_combustiveis, Spacer(1, 12), Paragraph("Viagens do período", estilos["secao_titulo"])]
+
+    # A lista de viagens se estende pelas páginas seguintes, repetindo o cabeçalho
+    tabela_viagens = Table([[titulo for titulo, _ in COLUNAS_DETALHE.values()]] + resumo['viagens'], repeatRows=1)
+    tabela_viagens.setStyle(ESTILO_TABELA_DETALHE)
+    story.append(tabela_viagens)
+
+    doc.build(story)
+
+
+def _renderizar(tarefa):
+    """Renderiza um relatório dentro de um processo do pool e retorna o caminho gerado."""
+    resumo, caminho = tarefa
+    gerar_relatorio_frota_pdf(resumo, caminho)
+    return caminho
+
+
+def gerar_relatorios_frota(df, diretorio, agrupar_por='Frota_ID', periodo='mes', n_processos=None):
+    """
+    Gera um PDF consolidado por frota e período em 'diretorio', em paralelo.
+
+    Args:
+        df: DataFrame enriquecido por 'processar_pipeline'
+        diretorio (str): Diretório de saída (criado se não existir)
+        agrupar_por (str): Coluna que identifica a frota ou o veículo
+        periodo (str, opcional): 'mes', 'ano' ou None
+        n_processos (int, opcional): Número de processos. Se omitido, usa todos os núcleos.
+
+    Returns:
+        dict: 'documentos', 'arquivos' (caminhos na ordem dos grupos), 'tempo_s' e 'documentos_por_s'
+    """
+    inicio = time.perf_counter()
+    with cronometrar('relatorio_frota', 'montar_resumos'):
+        resumos = montar_resumos(df, agrupar_por, periodo)
+    os.makedirs(diretorio, exist_ok=True)
+    tarefas = [(resumo, os.path.join(diretorio, nome)) for resumo, nome in zip(resumos, _nomes_arquivos(resumos))]
+
+    if n_processos is None:
+        n_processos = os.cpu_count() or 1
+    n_processos = max(1, min(n_processos, len(tarefas) // DOCUMENTOS_MINIMOS_POR_PROCESSO or 1))
+
+    with cronometrar('relatorio_frota', 'renderizacao'):
+        if n_processos == 1:
+            arquivos = [_renderizar(tarefa) for tarefa in tarefas]
+        else:
+            with ProcessPoolExecutor(max_workers=n_processos) as executor:
+                # Blocos de tarefas por envio reduzem a troca de mensagens com os processos
+                arquivos = list(executor.map(_renderizar, tarefas,
+                                             chunksize=max(1, len(tarefas) // (n_processos * 4))))
+
+    tempo = time.perf_counter() - inicio
+    return {
+        'documentos': len(arquivos),
+        'arquivos': arquivos,
+        'tempo_s': tempo,
+        'documentos_por_s': len(arquivos) / tempo if tempo > 0 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera relatórios PDF consolidados por frota e período')
+    parser.add_argument('arquivo', help='Arquivo de viagens (CSV, Parquet ou Arrow)')
+    parser.add_argument('diretorio', help='Diretório de saída dos PDFs')
+    parser.add_argument('--periodo', default='mes', choices=['mes', 'ano', 'total'],
+                        help="Período de cada relatório ('total' = todo o histórico)")
+    parser.add_argument('--agrupar-por', default='Frota_ID', help='Coluna que identifica a frota ou o veículo')
+    parser.add_argument('--processos', type=int, help='Número de processos (padrão: todos os núcleos)')
+    args = parser.parse_args()
+
+    dados = processar_pipeline(carregar_dados(args.arquivo))
+    resultado = gerar_relatorios_frota(dados, args.diretorio, args.agrupar_por,
+                                       None if args.periodo == 'total' else args.periodo, args.processos)
+    print(f"{resultado['documentos']} relatórios gerados em {args.diretorio} "
+          f"({resultado['tempo_s']:.1f} s, {resultado['documentos_por_s'] or 0:.1f} documentos/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+"""
+Geração dos relatórios PDF auditáveis do Carbon Log.
+
+Os estilos do ReportLab são construídos uma única vez, na primeira geração (o ReportLab só é
+importado nesse momento, para não pesar na inicialização da aplicação web). Os relatórios
+são gerados em segundo plano por um pool de threads e identificados pelo hash do seu conteúdo,
+de modo que entradas idênticas reaproveitam o relatório já gerado.
+
+Por padrão os PDFs são gerados em memória e mantidos em um cache LRU deste processo, limitado por
+quantidade, tamanho e tempo de vida. Com a variável de ambiente RELATORIOS_DIR eles são gravados
+em disco (veja "Relatórios PDF" no README para o uso com vários workers).
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+
+from cache_lru import CacheLRU
+from metricas import cronometrar
+
+
+@lru_cache(maxsize=None)
+def obter_estilos() -> dict:
+    """Constrói (uma única vez) os estilos de parágrafo e de tabela usados nos relatórios."""
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.platypus import TableStyle
+
+    styles = getSampleStyleSheet()
+
+    titulo = ParagraphStyle(
+        "Titulo",
+        parent=styles["Heading1"],
+        fontSize=16,
+        leading=20,
+        spaceAfter=8,
+    )
+    subtitulo = ParagraphStyle(
+        "Subtitulo",
+        parent=styles["Normal"],
+        fontSize=9,
+        textColor=colors.HexColor("#5a6d67"),
+        spaceAfter=12,
+    )
+    secao_titulo = ParagraphStyle(
+        "SecaoTitulo",
+        parent=styles["Heading2"],
+        fontSize=11,
+        textTransform="uppercase",
+        textColor=colors.HexColor("#0d5c4a"),
+        leading=14,
+        spaceAfter=6,
+    )
+    corpo = styles["Normal"]
+    corpo.spaceAfter = 6
+
+    tabela_viagem = TableStyle(
+        [
+            ("BACKGROUND", (0, 0), (1, 0), colors.HexColor("#f0f7f5")),
+            ("TEXTCOLOR", (0, 0), (1, 0), colors.HexColor("#1a2e28")),
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("ALIGN", (0, 0), (0, -1), "LEFT"),
+            ("ALIGN", (1, 0), (1, -1), "LEFT"),
+            ("INNERGRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#d4e5e1")),
+            ("BOX", (0, 0), (-1, -1), 0.25, colors.HexColor("#d4e5e1")),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ]
+    )
+    tabela_resultados = TableStyle(
+        [
+            ("BACKGROUND", (0, 0), (1, 0), colors.HexColor("#f0f7f5")),
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("INNERGRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#d4e5e1")),
+            ("BOX", (0, 0), (-1, -1), 0.25, colors.HexColor("#d4e5e1")),
+        ]
+    )
+
+    return {
+        "titulo": titulo,
+        "subtitulo": subtitulo,
+        "secao_titulo": secao_titulo,
+        "corpo": corpo,
+        "tabela_viagem": tabela_viagem,
+        "tabela_resultados": tabela_resultados,
+    }
+
+
+def gerar_relatorio_pdf(dados: dict, destino) -> None:
+    """
+    Gera um relatório PDF simples e auditável com base nos dados calculados.
+
+    'destino' pode ser o caminho de um arquivo ou um buffer binário (ex.: io.BytesIO).
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table
+
+    estilos = obter_estilos()
+    doc = SimpleDocTemplate(destino, pagesize=A4, title="Relatório de Emissões - Carbon Log")
+    titulo = estilos["titulo"]
+    subtitulo = estilos["subtitulo"]
+    secao_titulo = estilos["secao_titulo"]
+    corpo = estilos["corpo"]
+
+    story = []
+    story.append(Paragraph("Relatório de Emissões de GEE", titulo))
+    # O relatório é compartilhado por submissões idênticas (ver CAMPOS_RELATORIO): a data é a da primeira
+    story.append(Paragraph(
+        f"Carbon Log — emitido em {dados.get('data_relatorio', '')} "
+        "(primeira solicitação com estes dados de cálculo)", subtitulo))
+    story.append(Paragraph(f"Emissão total da viagem: <b>{dados.get('emissao_final', '')} tCO2e</b>", corpo))
+    story.append(Paragraph(f"Modo de cálculo: {dados.get('modo_calculo_label', '')} ({dados.get('modo_calculo_selo', '')})", corpo))
+    story.append(Spacer(1, 12))
+
+    # Dados da viagem
+    story.append(Paragraph("Dados da viagem", secao_titulo))
+    dados_viagem = [
+        ["Tipo de veículo", dados.get("tipo_veiculo")],
+        ["Combustível", dados.get("tipo_combustivel")],
+        ["Modo de cálculo", dados.get("modo_calculo_label")],
+        ["Litros consumidos", f"{dados.get('litros', '')} L ({dados.get('litros_texto_origem', '')})"],
+    ]
+    if dados.get("km_rodado") and float(dados.get("km_rodado", 0)) > 0:
+        dados_viagem.append(["Quilômetros rodados", f"{dados.get('km_rodado', '')} km"])
+    if dados.get("km_por_litro"):
+        dados_viagem.append(["Consumo do veículo", f"{dados.get('km_por_litro', '')} km/L"])
+    if dados.get("tipo_veiculo_raw") == "caminhao":
+        dados_viagem.append(["Carga transportada (t)", dados.get("carga_ton")])
+
+    tabela_viagem = Table(dados_viagem, colWidths=[180, 330])
+    tabela_viagem.setStyle(estilos["tabela_viagem"])
+    story.append(tabela_viagem)
+    story.append(Spacer(1, 12))
+
+    # Resultados
+    story.append(Paragraph("Resultados do cálculo", secao_titulo))
+    dados_resultados = [
+        ["Emissão total (tCO2e)", dados.get("emissao_final")],
+    ]
+    if dados.get("intensidade_km") and float(dados.get("intensidade_km", 0)) > 0:
+        dados_resultados.append(["Emissão por km (tCO2e/km)", dados.get("intensidade_km")])
+    if dados.get("eficiencia") and float(dados.get("eficiencia", 0)) > 0:
+        dados_resultados.append(["Eficiência (km/L)", dados.get("eficiencia")])
+    if dados.get("tipo_veiculo_raw") == "caminhao":
+        dados_resultados.append(["Intensidade por tonelada (tCO2e/ton)", dados.get("intensidade_ton")])
+
+    tabela_resultados = Table(dados_resultados, colWidths=[220, 290])
+    tabela_resultados.setStyle(estilos["tabela_resultados"])
+    story.append(tabela_resultados)
+    story.append(Spacer(1, 12))
+
+    # Comparação com média do setor
+    story.append(Paragraph("Comparação com média do setor", secao_titulo))
+    comp_texto = ""
+    situacao = dados.get("comparacao_setor_situacao")
+    perc = dados.get("comparacao_setor_percentual")
+    media_setor = dados.get("media_setor_intensidade_km")
+    if situacao == "indisponível":
+        comp_texto = "Não foi possível comparar com a média de referência (km ou emissões zeradas)."
+    else:
+        comp_texto = (
+            f"Resultado de aproximadamente {perc}% {situacao} da média de referência "
+            f"({media_setor} tCO2e/km)."
+        )
+    story.append(Paragraph(comp_texto, corpo))
+    story.append(Spacer(1, 12))
+
+    # Nota ESG / GHG Protocol
+    story.append(
+        Paragraph(
+            "Empresas que precisam reportar emissões ao GHG Protocol ou clientes ESG exigentes "
+            "utilizam relatórios auditáveis.",
+            corpo,
+        )
+    )
+
+    doc.build(story)
+
+
+# --- Geração em segundo plano e armazenamento ---
+
+# Campos de 'dados' que determinam o conteúdo do relatório. A data do relatório fica de fora:
+# uma nova submissão com os mesmos valores reaproveita o PDF já gerado, que por isso identifica
+# a data impressa como a da primeira solicitação.
+CAMPOS_RELATORIO = (
+    "emissao_final",
+    "modo_calculo_label",
+    "modo_calculo_selo",
+    "tipo_veiculo",
+    "tipo_veiculo_raw",
+    "tipo_combustivel",
+    "litros",
+    "litros_texto_origem",
+    "km_rodado",
+    "km_por_litro",
+    "carga_ton",
+    "intensidade_km",
+    "intensidade_ton",
+    "eficiencia",
+    "media_setor_intensidade_km",
+    "comparacao_setor_percentual",
+    "comparacao_setor_situacao",
+)
+
+# Diretório de persistência em disco. Sem ele, os relatórios ficam apenas na memória deste processo.
+DIRETORIO_RELATORIOS = os.getenv("RELATORIOS_DIR") or None
+
+_relatorios_memoria = CacheLRU(
+    max_itens=int(os.getenv("RELATORIOS_MAX_ITENS", "256")),
+    ttl_segundos=float(os.getenv("RELATORIOS_TTL_SEGUNDOS", "3600")),
+    max_bytes=int(float(os.getenv("RELATORIOS_MAX_MB", "64")) * 1024 * 1024),
+)
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RELATORIOS_PDF_WORKERS", "2")),
+    thread_name_prefix="relatorio-pdf",
+)
+_tarefas = {}
+_tarefas_lock = threading.Lock()
+
+# Relatórios aguardando ou em geração. Acima do limite, novos pedidos são recusados em vez de
+# acumular uma fila sem fim durante os picos de fechamento do mês.
+MAX_RELATORIOS_PENDENTES = int(os.getenv("RELATORIOS_FILA_MAX", "64"))
+_pendentes = 0
+
+
+class FilaRelatoriosCheia(RuntimeError):
+    """A fila de geração de relatórios atingiu MAX_RELATORIOS_PENDENTES."""
+
+
+def _concluir_tarefa(nome_arquivo: str, tarefa) -> None:
+    global _pendentes
+    with _tarefas_lock:
+        _pendentes -= 1
+        # Concluída com sucesso, o relatório já está no armazenamento e a tarefa não precisa mais ser
+        # acompanhada; as que falharam ficam para que status_relatorio informe o erro
+        if tarefa.exception() is None and _tarefas.get(nome_arquivo) is tarefa:
+            del _tarefas[nome_arquivo]
+
+
+def nome_relatorio(dados: dict) -> str:
+    """Retorna o identificador (nome do arquivo) do relatório, derivado do hash do seu conteúdo."""
+    conteudo = json.dumps({campo: dados.get(campo) for campo in CAMPOS_RELATORIO}, sort_keys=True)
+    resumo = hashlib.sha256(conteudo.encode("utf-8")).hexdigest()[:20]
+    return f"Relatorio_Carbono_Individual_{resumo}.pdf"
+
+
+def _caminho_em_disco(nome_arquivo: str) -> str:
+    return os.path.join(DIRETORIO_RELATORIOS, os.path.basename(nome_arquivo))
+
+
+def _relatorio_disponivel(nome_arquivo: str) -> bool:
+    if DIRETORIO_RELATORIOS is None:
+        return nome_arquivo in _relatorios_memoria
+    return os.path.isfile(_caminho_em_disco(nome_arquivo))
+
+
+def _gerar_relatorio(dados: dict, nome_arquivo: str) -> None:
+    """Gera o PDF em memória e o guarda no cache ou, se configurado, no diretório de relatórios."""
+    buffer = io.BytesIO()
+    with cronometrar("relatorio_pdf", "gerar_relatorio_pdf"):
+        gerar_relatorio_pdf(dados, buffer)
+
+    if DIRETORIO_RELATORIOS is None:
+        _relatorios_memoria.remover_expirados()
+        _relatorios_memoria.definir(nome_arquivo, buffer.getvalue())
+        return
+
+    # Grava em um arquivo temporário e o move ao terminar, para nunca servir um PDF incompleto
+    os.makedirs(DIRETORIO_RELATORIOS, exist_ok=True)
+    caminho_arquivo = _caminho_em_disco(nome_arquivo)
+    caminho_temporario = f"{caminho_arquivo}.{threading.get_ident()}.tmp"
+    try:
+        with open(caminho_temporario, "wb") as arquivo:
+            arquivo.write(buffer.getbuffer())
+        os.replace(caminho_temporario, caminho_arquivo)
+    finally:
+        if os.path.exists(caminho_temporario):
+            os.remove(caminho_temporario)
+
+
+def solicitar_relatorio(dados: dict) -> str:
+    """
+    Agenda a geração do relatório em segundo plano e retorna o seu identificador.
+
+    Se o relatório já estiver disponível ou já estiver sendo gerado, nada é agendado.
+
+    Raises:
+        FilaRelatoriosCheia: Se já houver MAX_RELATORIOS_PENDENTES relatórios na fila
+    """
+    global _pendentes
+    nome_arquivo = nome_relatorio(dados)
+    with _tarefas_lock:
+        tarefa = _tarefas.get(nome_arquivo)
+        if _relatorio_disponivel(nome_arquivo) or (tarefa is not None and not tarefa.done()):
+            return nome_arquivo
+        if _pendentes >= MAX_RELATORIOS_PENDENTES:
+            raise FilaRelatoriosCheia(f"{_pendentes} relatórios aguardando geração")
+        _pendentes += 1
+        tarefa = _tarefas[nome_arquivo] = _executor.submit(_gerar_relatorio, dict(dados), nome_arquivo)
+    # Fora do lock: se a tarefa já terminou, o callback roda nesta thread e precisa do lock
+    tarefa.add_done_callback(partial(_concluir_tarefa, nome_arquivo))
+    return nome_arquivo
+
+
+def status_relatorio(nome_arquivo: str) -> str:
+    """Retorna 'pronto', 'processando', 'erro' ou 'inexistente' para o relatório informado."""
+    with _tarefas_lock:
+        tarefa = _tarefas.get(nome_arquivo)
+    if tarefa is not None:
+        if not tarefa.done():
+            return "processando"
+        if tarefa.exception() is not None:
+            return "erro"
+    if _relatorio_disponivel(nome_arquivo):
+        return "pronto"
+    return "inexistente"
+
+
+def abrir_relatorio(nome_arquivo: str):
+    """
+    Retorna um objeto de arquivo binário com o PDF pronto, ou None se ele não estiver disponível.
+
+    Em memória, devolve um io.BytesIO sobre o conteúdo armazenado; em disco, o arquivo aberto.
+    """
+    if DIRETORIO_RELATORIOS is None:
+        conteudo = _relatorios_memoria.obter(nome_arquivo)
+        return None if conteudo is None else io.BytesIO(conteudo)
+    try:
+        return open(_caminho_em_disco(nome_arquivo), "rb")
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,188 @@
+"""
+Simulação de cenários de descarbonização da frota sobre o histórico de viagens.
+
+Cada cenário combina três alavancas:
+
+- fracao_migracao: fração das viagens do combustível de origem (padrão 'Diesel S10') que passa
+  para o combustível de destino (padrão 'Etanol'), em valor esperado;
+- idade_maxima: veículos mais velhos que isso são substituídos por novos (fator de idade 1.0),
+  mantendo as mesmas viagens;
+- meta_km_por_litro: viagens com eficiência abaixo da meta passam a consumir km / meta litros.
+
+O histórico passa uma única vez pelo pipeline de 'carbon_calculator' (fator de emissão, fator de
+idade e idade de cada viagem). Os parâmetros dos cenários viram um eixo extra dos arrays NumPy
+(cenários × viagens), processado em blocos de viagens para limitar a memória, e as somas por
+cenário são acumuladas bloco a bloco.
+
+Uso:
+    python simulacao.py viagens.csv --migracao 0,0.25,0.5 --idade-maxima 10,15 --meta-km-por-litro 3.5
+"""
+import argparse
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from carbon_calculator import carregar_dados, dividir_seguro, processar_pipeline, resolver_registro
+
+# Parâmetros de um cenário e o valor que não altera o histórico
+PARAMETROS_CENARIO = {
+    'fracao_migracao': 0.0,
+    'idade_maxima': np.inf,
+    'meta_km_por_litro': 0.0,
+}
+
+# Elementos (cenários × viagens) de cada bloco; limita os arrays temporários a algumas dezenas de MB
+ELEMENTOS_POR_BLOCO = 2_000_000
+
+
+def grade_cenarios(**valores):
+    """
+    Monta todas as combinações dos valores informados para cada parâmetro.
+
+    Exemplo: grade_cenarios(fracao_migracao=[0, 0.5, 1], idade_maxima=[None, 15]) gera 6 cenários.
+    None (ou parâmetro omitido) mantém o histórico para aquela alavanca.
+
+    Returns:
+        pandas.DataFrame: Um cenário por linha, com as colunas de PARAMETROS_CENARIO
+    """
+    desconhecidos = set(valores) - set(PARAMETROS_CENARIO)
+    if desconhecidos:
+        raise ValueError(f"Parâmetros desconhecidos: {sorted(desconhecidos)}. "
+                         f"Parâmetros disponíveis: {list(PARAMETROS_CENARIO)}")
+    listas = [valores.get(parametro, [None]) for parametro in PARAMETROS_CENARIO]
+    return pd.DataFrame(list(itertools.product(*listas)), columns=list(PARAMETROS_CENARIO))
+
+
+def _normalizar_cenarios(cenarios):
+    """Converte os cenários em um DataFrame com os parâmetros preenchidos e validados."""
+    cenarios = pd.DataFrame(cenarios).reset_index(drop=True)
+    desconhecidos = set(cenarios.columns) - set(PARAMETROS_CENARIO) - {'nome'}
+    if desconhecidos:
+        raise ValueError(f"Parâmetros desconhecidos: {sorted(desconhecidos)}. "
+                         f"Parâmetros disponíveis: {list(PARAMETROS_CENARIO)}")
+    for parametro, neutro in PARAMETROS_CENARIO.items():
+        valores = cenarios[parametro] if parametro in cenarios else pd.Series(np.nan, index=cenarios.index)
+        cenarios[parametro] = pd.to_numeric(valores).astype(float).fillna(neutro)
+
+    if ((cenarios['fracao_migracao'] < 0) | (cenarios['fracao_migracao'] > 1)).any():
+        raise ValueError("'fracao_migracao' deve estar entre 0 e 1")
+    if (cenarios['idade_maxima'] < 0).any() or (cenarios['meta_km_por_litro'] < 0).any():
+        raise ValueError("'idade_maxima' e 'meta_km_por_litro' não podem ser negativos")
+    return cenarios
+
+
+def simular_cenarios(df, cenarios, combustivel_origem='Diesel S10', combustivel_destino='Etanol',
+                     razao_consumo=1.0, registro=None, ano_atual=None):
+    """
+    Calcula as emissões totais de cada cenário sobre todas as viagens de 'df', de uma só vez.
+
+    Args:
+        df: DataFrame de viagens (esquema de 'dados_exemplo.csv'); não é modificado
+        cenarios: DataFrame ou lista de dicts com 'fracao_migracao', 'idade_maxima' e
+            'meta_km_por_litro' (ausente/None = sem alteração) e, opcionalmente, 'nome'
+        combustivel_origem (str): Combustível substituído na migração
+        combustivel_destino (str): Combustível adotado na migração
+        razao_consumo (float): Litros do combustível de destino por litro do de origem na mesma
+            viagem (1.0 = mesmo volume)
+        registro (RegistroFatores, opcional): Fatores a usar. Se omitido, usa o registro padrão.
+        ano_atual (int, opcional): Ano de referência do fator de idade
+
+    Returns:
+        pandas.DataFrame: Um cenário por linha, com os parâmetros, 'Combustivel_L' (litros consumidos,
+        com a parcela migrada já em litros do combustível de destino), 'emissao_base',
+        'emissao_final', as intensidades e a redução em relação ao histórico
+        ('reducao_tCO2e', 'reducao_percentual')
+
+    Raises:
+        ValueError: Se um combustível da migração não existir no registro ou um parâmetro for inválido
+    """
+    registro = resolver_registro(registro, ano_atual)
+    fatores_emissao = registro.fatores_emissao
+    for combustivel in (combustivel_origem, combustivel_destino):
+        if combustivel not in fatores_emissao:
+            raise ValueError(f"Tipo de combustível '{combustivel}' não encontrado. "
+                             f"Tipos disponíveis: {list(fatores_emissao.keys())}")
+    cenarios = _normalizar_cenarios(cenarios)
+
+    # Histórico calculado uma única vez pelo pipeline (fatores de emissão e de idade por viagem)
+    historico = processar_pipeline(df.copy(), registro=registro)
+    litros = historico['Combustivel_L'].to_numpy(dtype=float)
+    km = historico['KM_Rodado'].to_numpy(dtype=float)
+    fator_emissao = np.nan_to_num(historico['Fator_Emissao'].to_numpy(dtype=float))
+    fator_idade = historico['Fator_idade'].to_numpy(dtype=float)
+    idade = historico['Idade_Veiculo'].to_numpy(dtype=float)
+    migravel = (historico['Tipo_Combustivel'] == combustivel_origem).to_numpy()
+
+    # Parâmetros como colunas (cenários × 1), que se propagam sobre o eixo das viagens
+    fracao = cenarios['fracao_migracao'].to_numpy()[:, None]
+    idade_maxima = cenarios['idade_maxima'].to_numpy()[:, None]
+    meta = cenarios['meta_km_por_litro'].to_numpy()[:, None]
+    # Fator por litro de origem de uma viagem migrável: mistura esperada dos dois combustíveis
+    fator_migrado = ((1 - fracao) * fatores_emissao[combustivel_origem]
+                     + fracao * fatores_emissao[combustivel_destino] * razao_consumo)
+    # Litros consumidos por litro de origem de uma viagem migrável
+    litros_migrados = (1 - fracao) + fracao * razao_consumo
+
+    n_cenarios = len(cenarios)
+    litros_total = np.zeros(n_cenarios)
+    emissao_base_total = np.zeros(n_cenarios)
+    emissao_final_total = np.zeros(n_cenarios)
+    tamanho_bloco = max(1, ELEMENTOS_POR_BLOCO // max(n_cenarios, 1))
+    for inicio in range(0, len(historico), tamanho_bloco):
+        trecho = slice(inicio, inicio + tamanho_bloco)
+        # Meta de eficiência: o consumo cai para km / meta quando a viagem está abaixo dela
+        # (viagens sem litros ou sem km ficam como estão)
+        litros_meta = np.divide(km[trecho], meta, out=np.full((n_cenarios, len(km[trecho])), np.inf),
+                                where=meta > 0)
+        litros_cenario = np.where(litros_meta < litros[trecho], litros_meta, litros[trecho])
+        # Como no pipeline, emissão base indeterminada (litros ausentes) conta como zero e emissões
+        # finais ausentes (ano de fabricação ausente) ficam fora das somas
+        emissao_base = np.nan_to_num(
+            litros_cenario * np.where(migravel[trecho], fator_migrado, fator_emissao[trecho]), nan=0.0)
+        emissao_final = emissao_base * np.where(idade[trecho] > idade_maxima, 1.0, fator_idade[trecho])
+        litros_total += np.nansum(litros_cenario * np.where(migravel[trecho], litros_migrados, 1.0), axis=1)
+        emissao_base_total += emissao_base.sum(axis=1)
+        emissao_final_total += np.nansum(emissao_final, axis=1)
+
+    emissao_historica = historico['emissao_final'].sum()
+    resultado = cenarios.copy()
+    resultado['Combustivel_L'] = litros_total
+    resultado['emissao_base'] = emissao_base_total
+    resultado['emissao_final'] = emissao_final_total
+    resultado['Intensidade_tCO2e_por_KM'] = dividir_seguro(emissao_final_total, np.full(n_cenarios, np.nansum(km)))
+    resultado['Intensidade_tCO2e_por_Ton'] = dividir_seguro(
+        emissao_final_total, np.full(n_cenarios, historico['Carga_Ton'].sum()))
+    resultado['reducao_tCO2e'] = emissao_historica - emissao_final_total
+    resultado['reducao_percentual'] = dividir_seguro(resultado['reducao_tCO2e'] * 100,
+                                                     np.full(n_cenarios, emissao_historica))
+    return resultado
+
+
+def _lista_valores(texto):
+    """Converte '0,0.5,nenhum' em [0.0, 0.5, None]."""
+    return [None if valor.strip().lower() in ('', 'nenhum', 'none') else float(valor)
+            for valor in texto.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simula cenários de descarbonização sobre o histórico de viagens')
+    parser.add_argument('arquivo', help='Arquivo de viagens (CSV, Parquet ou Arrow)')
+    parser.add_argument('--migracao', default='0', help='Frações de migração separadas por vírgula')
+    parser.add_argument('--origem', default='Diesel S10', help='Combustível substituído')
+    parser.add_argument('--destino', default='Etanol', help='Combustível adotado')
+    parser.add_argument('--idade-maxima', default='nenhum', help="Idades máximas separadas por vírgula ('nenhum' = sem renovação)")
+    parser.add_argument('--meta-km-por-litro', default='nenhum', help="Metas de km/L separadas por vírgula ('nenhum' = sem meta)")
+    args = parser.parse_args()
+
+    cenarios = grade_cenarios(
+        fracao_migracao=_lista_valores(args.migracao),
+        idade_maxima=_lista_valores(args.idade_maxima),
+        meta_km_por_litro=_lista_valores(args.meta_km_por_litro),
+    )
+    resultado = simular_cenarios(carregar_dados(args.arquivo), cenarios, args.origem, args.destino)
+    print(resultado.sort_values('emissao_final').to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
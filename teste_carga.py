@@ -0,0 +1,231 @@
+"""
+Teste de carga concorrente da aplicação web servida pelo gunicorn.
+
+Compara o modo anterior ('sync': um pedido por worker, como em 'gunicorn app:app') com o modo
+'gthread' de gunicorn.conf.py, com o mesmo número de workers, em três cenários:
+
+- 'rotas': POST /calcular com coordenadas e sem distância, com DISTANCIAS_BACKEND=rotas. Um serviço
+  de rotas local (compatível com o OSRM) responde com latência configurável, simulando a espera de
+  E/S que prende um worker 'sync'.
+- 'haversine': a mesma requisição com o backend padrão (haversine, sem rede). Mede o cálculo e a
+  página de resultado, sem espera de E/S.
+- 'download': POST /calcular com o backend padrão, seguido da consulta de status do PDF (como a
+  página de resultado faz) e do download do relatório. A latência é a do fluxo completo.
+
+As coordenadas variam a cada requisição para não usar o cache. O resultado (requisições por
+segundo e latências média, p50 e p99 por cenário e modo) é impresso em JSON.
+
+Uso:
+    python teste_carga.py [--requisicoes 400] [--concorrencia 32] [--latencia-rotas 0.05]
+                          [--modos sync,gthread] [--cenarios rotas,haversine,download]
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DIRETORIO_PROJETO = os.path.dirname(os.path.abspath(__file__))
+
+FORMULARIO_BASE = {
+    'email': 'carga@example.com',
+    'tipo_veiculo': 'caminhao',
+    'tipo_combustivel': 'Diesel S10',
+    'modo_calculo': 'estimado',
+    'km_por_litro': '3.2',
+    'carga_ton': '18',
+}
+
+# Link do relatório na página de resultado (ver templates/resultado.html)
+PADRAO_LINK_RELATORIO = re.compile(r'href="(/download/[^"]+\.pdf)"')
+
+
+def _porta_livre():
+    with socket.socket() as soquete:
+        soquete.bind(('127.0.0.1', 0))
+        return soquete.getsockname()[1]
+
+
+def iniciar_servico_rotas(latencia_s):
+    """Inicia em uma thread um serviço de rotas falso que responde após 'latencia_s' segundos."""
+
+    class Manipulador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latencia_s)
+            corpo = json.dumps({'code': 'Ok', 'routes': [{'distance': 850_000.0}]}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', _porta_livre()), Manipulador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def _aguardar_servidor(url, processo, timeout_s=30):
+    limite = time.monotonic() + timeout_s
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"gunicorn encerrou com código {processo.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} não respondeu em {timeout_s} s")
+
+
+def _formulario(numero):
+    """Formulário com coordenadas únicas para a requisição 'numero' (sem distância informada)."""
+    return {
+        **FORMULARIO_BASE,
+        'lat_origem': f'{-23.5 + numero * 0.001:.4f}', 'lng_origem': '-46.63',
+        'lat_destino': '-22.01', 'lng_destino': '-47.89',
+    }
+
+
+def _calcular(base, numero):
+    """Envia um POST /calcular e retorna a página de resultado (None se a resposta não for 200)."""
+    dados = urllib.parse.urlencode(_formulario(numero)).encode()
+    with urllib.request.urlopen(f'{base}/calcular', data=dados, timeout=120) as resposta:
+        return resposta.read().decode('utf-8') if resposta.status == 200 else None
+
+
+def _requisitar(base, numero, intervalo_status):
+    """Apenas o cálculo: retorna (latência em s, sucesso)."""
+    inicio = time.perf_counter()
+    try:
+        sucesso = _calcular(base, numero) is not None
+    except (urllib.error.URLError, ConnectionError):
+        sucesso = False
+    return time.perf_counter() - inicio, sucesso
+
+
+def _requisitar_download(base, numero, intervalo_status):
+    """Cálculo, espera pelo PDF (consultando o status) e download: retorna (latência em s, sucesso)."""
+    inicio = time.perf_counter()
+    try:
+        pagina = _calcular(base, numero)
+        link = PADRAO_LINK_RELATORIO.search(pagina or '')
+        if link is None:
+            # Sem link: a fila de relatórios estava cheia ou o cálculo falhou
+            return time.perf_counter() - inicio, False
+        url = f'{base}{link.group(1)}'
+        while True:
+            with urllib.request.urlopen(f'{url}?status=1', timeout=120) as resposta:
+                status = json.load(resposta)['status']
+            if status != 'processando':
+                break
+            time.sleep(intervalo_status)
+        with urllib.request.urlopen(url, timeout=120) as resposta:
+            sucesso = status == 'pronto' and resposta.read(4) == b'%PDF'
+    except (urllib.error.URLError, ConnectionError):
+        sucesso = False
+    return time.perf_counter() - inicio, sucesso
+
+
+# Cenários: nome -> (usa o serviço de rotas simulado, função que executa uma requisição)
+CENARIOS = {
+    'rotas': (True, _requisitar),
+    'haversine': (False, _requisitar),
+    'download': (False, _requisitar_download),
+}
+
+
+def medir_modo(modo, cenario, requisicoes, concorrencia, workers, threads, url_rotas, intervalo_status=0.1):
+    """Sobe o gunicorn no modo informado, dispara a carga do cenário e retorna as estatísticas."""
+    usa_rotas, requisitar = CENARIOS[cenario]
+    porta = _porta_livre()
+    # Com mais de uma thread o gunicorn troca 'sync' por 'gthread'; o modo sync precisa de --threads 1
+    argumentos = ['-k', modo, '-w', str(workers), '--threads', str(threads if modo == 'gthread' else 1)]
+    ambiente = {chave: valor for chave, valor in os.environ.items() if chave != 'DISTANCIAS_BACKEND'}
+    if usa_rotas:
+        ambiente.update(DISTANCIAS_BACKEND='rotas', DISTANCIAS_URL=url_rotas)
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{porta}',
+         '--log-level', 'warning', *argumentos, 'app:app'],
+        cwd=DIRETORIO_PROJETO, env=ambiente,
+    )
+    try:
+        base = f'http://127.0.0.1:{porta}'
+        _aguardar_servidor(f'{base}/', processo)
+        # Aquecimento: carrega módulos e estilos antes da medição
+        requisitar(base, -1, intervalo_status)
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+            resultados = list(executor.map(lambda numero: requisitar(base, numero, intervalo_status),
+                                           range(requisicoes)))
+        duracao = time.perf_counter() - inicio
+    finally:
+        processo.terminate()
+        processo.wait(timeout=30)
+
+    latencias = sorted(latencia * 1000 for latencia, _ in resultados)
+    return {
+        'workers': workers,
+        'threads': threads if modo == 'gthread' else 1,
+        'requisicoes': requisicoes,
+        'concorrencia': concorrencia,
+        'erros': sum(1 for _, sucesso in resultados if not sucesso),
+        'requisicoes_por_s': requisicoes / duracao,
+        'media_ms': statistics.fmean(latencias),
+        'p50_ms': latencias[int(0.50 * (len(latencias) - 1))],
+        'p99_ms': latencias[int(0.99 * (len(latencias) - 1))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga concorrente: gunicorn sync x gthread')
+    parser.add_argument('--requisicoes', type=int, default=400, help='Total de requisições por modo')
+    parser.add_argument('--concorrencia', type=int, default=32, help='Clientes simultâneos')
+    parser.add_argument('--workers', type=int, default=1, help='Workers do gunicorn nos dois modos')
+    parser.add_argument('--threads', type=int, default=16, help='Threads por worker no modo gthread')
+    parser.add_argument('--latencia-rotas', type=float, default=0.05,
+                        help='Latência (s) do serviço de rotas simulado')
+    parser.add_argument('--modos', default='sync,gthread', help='Modos do gunicorn, separados por vírgula')
+    parser.add_argument('--cenarios', default=','.join(CENARIOS),
+                        help=f"Cenários, separados por vírgula ({', '.join(CENARIOS)})")
+    parser.add_argument('--intervalo-status', type=float, default=0.1,
+                        help='Intervalo (s) entre as consultas de status do PDF no cenário download')
+    args = parser.parse_args()
+
+    cenarios = args.cenarios.split(',')
+    invalidos = [cenario for cenario in cenarios if cenario not in CENARIOS]
+    if invalidos:
+        parser.error(f"cenários inválidos: {', '.join(invalidos)}")
+
+    servico_rotas = iniciar_servico_rotas(args.latencia_rotas)
+    url_rotas = f'http://127.0.0.1:{servico_rotas.server_address[1]}'
+    try:
+        resultados = {
+            cenario: {
+                modo: medir_modo(modo, cenario, args.requisicoes, args.concorrencia, args.workers, args.threads,
+                                 url_rotas, args.intervalo_status)
+                for modo in args.modos.split(',')
+            }
+            for cenario in cenarios
+        }
+    finally:
+        servico_rotas.shutdown()
+    print(json.dumps({'latencia_rotas_s': args.latencia_rotas, 'cenarios': resultados}, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Modo somente leitura do armazém de emissões, usado pelas rotas /api/emissoes da aplicação web.
+"""
+import hashlib
+import os
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import app as aplicacao
+from armazem import ArmazemEmissoes
+
+ARQUIVO_EXEMPLO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dados_exemplo.csv')
+
+
+def _hash_arquivo(caminho):
+    with open(caminho, 'rb') as arquivo:
+        return hashlib.sha256(arquivo.read()).hexdigest()
+
+
+@pytest.fixture
+def banco(tmp_path):
+    caminho = str(tmp_path / 'carbon_log.db')
+    with ArmazemEmissoes(caminho) as armazem:
+        armazem.incorporar(pd.read_csv(ARQUIVO_EXEMPLO, encoding='utf-8'))
+    return caminho
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    def _cliente(caminho):
+        monkeypatch.setattr(aplicacao, 'CAMINHO_ARMAZEM', caminho)
+        return aplicacao.app.test_client()
+    return _cliente
+
+
+# --- Testes ---
+def test_somente_leitura_nao_cria_o_banco(tmp_path):
+    caminho = str(tmp_path / 'inexistente.db')
+    with pytest.raises(FileNotFoundError):
+        ArmazemEmissoes(caminho, somente_leitura=True)
+    assert not os.path.exists(caminho)
+
+
+def test_somente_leitura_consulta_sem_alterar_o_banco(banco):
+    antes = _hash_arquivo(banco)
+    with ArmazemEmissoes(banco) as armazem:
+        esperado = armazem.totais()
+
+    with ArmazemEmissoes(banco, somente_leitura=True) as armazem:
+        assert armazem.totais() == esperado
+        with pytest.raises(sqlite3.OperationalError):
+            armazem.incorporar(pd.read_csv(ARQUIVO_EXEMPLO, encoding='utf-8').assign(ID_Viagem='nova'))
+    assert _hash_arquivo(banco) == antes
+
+
+def test_somente_leitura_nao_grava_metadados(tmp_path):
+    caminho = str(tmp_path / 'vazio.db')
+    with ArmazemEmissoes(caminho) as armazem:
+        armazem.conexao.execute("DELETE FROM metadados")
+        armazem.conexao.commit()
+
+    with ArmazemEmissoes(caminho, somente_leitura=True) as armazem:
+        assert armazem.totais()['Viagens'] == 0
+    with sqlite3.connect(caminho) as conexao:
+        assert conexao.execute("SELECT COUNT(*) FROM metadados").fetchone() == (0,)
+
+
+@pytest.mark.parametrize('rota', ['/api/emissoes/totais', '/api/emissoes/maiores', '/api/emissoes/serie'])
+def test_api_sem_armazem_responde_404(tmp_path, cliente, rota):
+    caminho = str(tmp_path / 'carbon_log.db')
+    resposta = cliente(caminho).get(rota)
+
+    assert resposta.status_code == 404
+    assert 'erro' in resposta.get_json()
+    assert not os.path.exists(caminho)
+
+
+def test_api_consulta_armazem_existente(banco, cliente):
+    antes = _hash_arquivo(banco)
+    resposta = cliente(banco).get('/api/emissoes/totais')
+
+    assert resposta.status_code == 200
+    assert resposta.get_json()['Viagens'] == len(pd.read_csv(ARQUIVO_EXEMPLO, encoding='utf-8'))
+    assert _hash_arquivo(banco) == antes
@@ -0,0 +1,59 @@
+"""
+Limite de consultas simultâneas do ServicoRotas, compartilhado entre lotes e chamadas concorrentes.
+"""
+import threading
+import time
+
+from distancias import ResolvedorDistancias, ServicoRotas
+
+
+class ServicoRotasContado(ServicoRotas):
+    """Substitui a consulta HTTP por uma espera curta e registra o pico de consultas simultâneas."""
+
+    def __init__(self, **opcoes):
+        super().__init__(url_base='http://stub', **opcoes)
+        self._trava = threading.Lock()
+        self.em_andamento = 0
+        self.pico = 0
+
+    def _consultar(self, lat_origem, lng_origem, lat_destino, lng_destino):
+        with self._trava:
+            self.em_andamento += 1
+            self.pico = max(self.pico, self.em_andamento)
+        time.sleep(0.01)
+        with self._trava:
+            self.em_andamento -= 1
+        return float(lat_destino)
+
+
+def _pares(inicio, n):
+    return [(0.0, 0.0, float(i), 0.0) for i in range(inicio, inicio + n)]
+
+
+# --- Testes ---
+def test_limite_vale_para_todos_os_lotes():
+    servico = ServicoRotasContado(max_concorrentes=3)
+    resolvedor = ResolvedorDistancias(servico, tamanho_lote=2)
+
+    assert resolvedor.resolver_sincrono(_pares(0, 20)) == [float(i) for i in range(20)]
+    assert servico.pico == 3
+
+
+def test_limite_vale_para_chamadas_concorrentes():
+    chamadas = 4
+    servico = ServicoRotasContado(max_concorrentes=3)
+    resolvedor = ResolvedorDistancias(servico, tamanho_lote=5)
+    resultados = {}
+
+    def resolver(indice):
+        pares = _pares(indice * 100, 10)
+        resultados[indice] = resolvedor.resolver_sincrono(pares) == [par[2] for par in pares]
+
+    threads = [threading.Thread(target=resolver, args=(i,)) for i in range(chamadas)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(resultados.values()) and len(resultados) == chamadas
+    assert servico.pico <= 3
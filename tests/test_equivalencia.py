@@ -0,0 +1,245 @@
+"""
+Equivalência entre as funções vetorizadas de 'carbon_calculator' e as implementações linha a linha
+(DataFrame.apply) que elas substituíram.
+
+As funções de referência abaixo são cópias das versões originais, com o ano de referência
+fixado para que o resultado não dependa da data em que os testes rodam.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import carbon_calculator
+from carbon_calculator import (calcular_emissao, calcular_fator_idade, calcular_intensidade, compactar_tipos,
+                               processar_em_paralelo, processar_pipeline, resumir_resultados)
+from fatores import ANO_INICIAL_TABELA, ANOS_FUTUROS_TABELA, calcular_viagem, obter_registro
+from simulacao import simular_cenarios
+
+ANO_REFERENCIA = 2025
+
+ARQUIVO_EXEMPLO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dados_exemplo.csv')
+
+# Limites dos blocos de penalidade (o último ano de cada bloco e o primeiro do seguinte)
+ANOS_LIMITE = [1995, 1996, 1999, 2000, 2005, 2006, 2011, 2012, 2022, 2023]
+
+# Colunas que dependem apenas do consumo, do combustível e do ano (iguais bit a bit no modo compacto)
+COLUNAS_EMISSAO = ['Fator_Emissao', 'emissao_base', 'Idade_Veiculo', 'Fator_idade', 'emissao_final']
+# Colunas que dividem por carga ou distância, em float32 no modo compacto
+COLUNAS_INTENSIDADE = ['Intensidade_tCO2e_por_Ton', 'Intensidade_tCO2e_por_KM', 'Eficiencia_KM_por_L']
+
+# Colunas calculadas que 'calcular_viagem' devolve para uma viagem
+COLUNAS_VIAGEM = ('Fator_Emissao', 'emissao_base', 'Idade_Veiculo', 'Fator_idade', 'emissao_final',
+                  'Intensidade_tCO2e_por_Ton', 'Intensidade_tCO2e_por_KM', 'Eficiencia_KM_por_L')
+
+
+# --- Implementações de referência (linha a linha) ---
+def calcular_fator_idade_referencia(df, ano_atual=ANO_REFERENCIA):
+    def calcular_taxa_penalidade(ano_fabricacao):
+        if ano_fabricacao >= 2023:
+            return 0.01  # 1.0%
+        elif ano_fabricacao >= 2012:
+            return 0.015  # 1.5%
+        elif ano_fabricacao >= 2006:
+            return 0.025  # 2.5%
+        elif ano_fabricacao >= 2000:
+            return 0.03   # 3.0%
+        elif ano_fabricacao >= 1996:
+            return 0.04   # 4.0%
+        else:
+            return 0.05   # 5.0%
+
+    def calcular_fator_ajuste(row):
+        ano_fabricacao = row['Ano_Fabricacao']
+        idade_veiculo = ano_atual - ano_fabricacao
+        taxa_penalidade = calcular_taxa_penalidade(ano_fabricacao)
+        return 1.0 + idade_veiculo * taxa_penalidade
+
+    df['Idade_Veiculo'] = ano_atual - df['Ano_Fabricacao']
+    df['Idade_Veiculo'] = df['Idade_Veiculo'].clip(lower=0)
+    df['Fator_idade'] = df.apply(calcular_fator_ajuste, axis=1)
+    df['emissao_final'] = df['Fator_idade'] * df['emissao_base']
+    return df
+
+
+def calcular_intensidade_referencia(df):
+    df['Intensidade_tCO2e_por_Ton'] = df.apply(
+        lambda row: 0 if row['Carga_Ton'] == 0 else row['emissao_final'] / row['Carga_Ton'],
+        axis=1
+    )
+    df['Intensidade_tCO2e_por_KM'] = df.apply(
+        lambda row: 0 if row['KM_Rodado'] == 0 else row['emissao_final'] / row['KM_Rodado'],
+        axis=1
+    )
+    df['Eficiencia_KM_por_L'] = df.apply(
+        lambda row: 0 if row['Combustivel_L'] == 0 else row['KM_Rodado'] / row['Combustivel_L'],
+        axis=1
+    )
+    return df
+
+
+# --- Dados ---
+def gerar_viagens_aleatorias(n=500, semente=42):
+    """
+    Viagens aleatórias com os casos difíceis: denominadores zero e ausentes, combustível
+    desconhecido ou ausente e anos ausentes, fracionários, futuros, anteriores a 1996 e em
+    todos os limites dos blocos de penalidade.
+    """
+    rng = np.random.default_rng(semente)
+
+    def com_especiais(valores, especiais):
+        valores = valores.astype(float)
+        posicoes = rng.choice(n, size=len(especiais) * 5, replace=False)
+        valores[posicoes] = np.repeat(especiais, 5)
+        return valores
+
+    anos = rng.integers(1980, ANO_REFERENCIA + 5, size=n).astype(float)
+    especiais = ANOS_LIMITE + [np.nan, 2018.5, 1995.999, ANO_REFERENCIA + 3, 1970, 1899, ANO_REFERENCIA]
+    anos[:len(especiais)] = especiais
+    anos[len(especiais):len(especiais) * 2] = rng.choice(ANOS_LIMITE, size=len(especiais))
+
+    return pd.DataFrame({
+        'ID_Viagem': [f'V{i:04d}' for i in range(n)],
+        'Frota_ID': rng.choice(['C01A', 'C02B', 'C03C'], size=n),
+        'Combustivel_L': com_especiais(rng.uniform(1, 900, size=n).round(1), [0.0, np.nan]),
+        'Tipo_Combustivel': rng.choice(['Diesel S10', 'Gasolina', 'Etanol', 'Hidrogenio', None], size=n,
+                                       p=[0.5, 0.2, 0.15, 0.1, 0.05]),
+        'KM_Rodado': com_especiais(rng.integers(1, 4000, size=n), [0.0, np.nan]),
+        'Carga_Ton': com_especiais(rng.uniform(0.5, 40, size=n).round(2), [0.0, np.nan]),
+        'Numero_Eixos': rng.integers(2, 10, size=n),
+        'Ano_Fabricacao': anos,
+    })
+
+
+@pytest.fixture(params=['dados_exemplo', 'aleatorio'])
+def viagens(request):
+    if request.param == 'dados_exemplo':
+        return pd.read_csv(ARQUIVO_EXEMPLO, encoding='utf-8')
+    return gerar_viagens_aleatorias()
+
+
+@pytest.fixture
+def registro():
+    return obter_registro(ANO_REFERENCIA)
+
+
+# --- Testes ---
+def test_fator_idade_equivale_ao_apply(viagens, registro):
+    base = calcular_emissao(viagens, registro=registro)
+    esperado = calcular_fator_idade_referencia(base.copy())
+    obtido = calcular_fator_idade(base.copy(), registro=registro)
+    pd.testing.assert_frame_equal(obtido, esperado)
+
+
+def test_intensidade_equivale_ao_apply(viagens, registro):
+    com_idade = calcular_fator_idade(calcular_emissao(viagens, registro=registro), registro=registro)
+    esperado = calcular_intensidade_referencia(com_idade.copy())
+    obtido = calcular_intensidade(com_idade.copy())
+    pd.testing.assert_frame_equal(obtido, esperado)
+
+
+def test_limites_dos_blocos(registro):
+    viagens = pd.DataFrame({'Ano_Fabricacao': ANOS_LIMITE, 'emissao_base': 1.0})
+    esperado = calcular_fator_idade_referencia(viagens.copy())
+    obtido = calcular_fator_idade(viagens.copy(), registro=registro)
+    pd.testing.assert_frame_equal(obtido, esperado)
+    # Cada limite muda de bloco: 1995 usa 5.0% e 1996 usa 4.0%, e assim por diante
+    assert obtido.set_index('Ano_Fabricacao').loc[1995, 'Fator_idade'] == 1.0 + 30 * 0.05
+    assert obtido.set_index('Ano_Fabricacao').loc[1996, 'Fator_idade'] == 1.0 + 29 * 0.04
+
+
+def test_calcular_viagem_equivale_ao_pipeline(viagens, registro):
+    esperado = processar_pipeline(viagens.copy(), registro=registro)[list(COLUNAS_VIAGEM)]
+    obtido = pd.DataFrame([
+        calcular_viagem(linha.Combustivel_L, linha.Tipo_Combustivel, linha.KM_Rodado, linha.Carga_Ton,
+                        linha.Ano_Fabricacao, registro=registro)
+        for linha in viagens.itertuples(index=False)
+    ], index=esperado.index)
+    # O cálculo individual devolve None como fator de um combustível desconhecido
+    obtido['Fator_Emissao'] = obtido['Fator_Emissao'].astype(float)
+    pd.testing.assert_frame_equal(obtido, esperado)
+
+
+def test_modo_compacto_equivale_ao_padrao(viagens, registro):
+    esperado = processar_pipeline(viagens.copy(), registro=registro)
+    obtido = processar_pipeline(compactar_tipos(viagens.copy()), registro=registro)
+    # O fator consultado pelo código da categoria e as emissões são idênticos; só os tipos mudam
+    pd.testing.assert_frame_equal(obtido[COLUNAS_EMISSAO], esperado[COLUNAS_EMISSAO], check_dtype=False,
+                                  rtol=0, atol=0)
+    pd.testing.assert_frame_equal(obtido[COLUNAS_INTENSIDADE], esperado[COLUNAS_INTENSIDADE], rtol=1e-6)
+
+
+def test_modo_compacto_nao_trunca_inteiros():
+    viagens = gerar_viagens_aleatorias().dropna(subset=['Ano_Fabricacao'])
+    viagens.loc[viagens.index[:3], 'Numero_Eixos'] = [300, -200, 9]
+    compacto = compactar_tipos(viagens.copy())
+    # Ano fracionário e eixos fora da faixa do int8: as colunas ficam como estão
+    assert compacto['Ano_Fabricacao'].dtype == viagens['Ano_Fabricacao'].dtype
+    assert compacto['Numero_Eixos'].dtype == viagens['Numero_Eixos'].dtype
+    pd.testing.assert_series_equal(compacto['Numero_Eixos'], viagens['Numero_Eixos'])
+
+    inteiros = viagens[viagens['Ano_Fabricacao'] == viagens['Ano_Fabricacao'].round()].iloc[3:]
+    compacto = compactar_tipos(inteiros.copy())
+    assert compacto['Ano_Fabricacao'].dtype == 'int16' and compacto['Numero_Eixos'].dtype == 'int8'
+
+
+def test_tabela_de_fatores_de_idade_equivale_a_formula(registro):
+    ultimo_ano_tabela = ANO_REFERENCIA + ANOS_FUTUROS_TABELA
+    # Toda a tabela, os anos logo fora dela, fracionários e ausentes (calculados pela fórmula)
+    anos = np.concatenate([
+        np.arange(ANO_INICIAL_TABELA - 5, ultimo_ano_tabela + 6),
+        [1995.5, 2022.999, 2023.001, ANO_INICIAL_TABELA - 0.5, ultimo_ano_tabela + 0.5, np.nan],
+    ]).astype(float)
+    viagens = pd.DataFrame({'Ano_Fabricacao': anos, 'emissao_base': 1.0})
+    esperado = calcular_fator_idade_referencia(viagens.copy())
+    pd.testing.assert_frame_equal(calcular_fator_idade(viagens.copy(), registro=registro), esperado)
+
+    # A consulta individual (como no formulário, com o ano inteiro) usa a mesma tabela
+    informados = [int(ano) if ano == int(ano) else ano for ano in anos[~np.isnan(anos)]]
+    np.testing.assert_array_equal([registro.fator_idade(ano) for ano in informados],
+                                  esperado['Fator_idade'].dropna().to_numpy())
+
+
+def test_cenario_sem_alteracao_equivale_ao_pipeline(viagens, registro):
+    historico = processar_pipeline(viagens.copy(), registro=registro)
+    resultado = simular_cenarios(viagens, [{}], registro=registro).iloc[0]
+    # Litros e emissões ausentes seguem o pipeline: emissão base zero e somas que ignoram ausentes
+    for coluna in ('Combustivel_L', 'emissao_base', 'emissao_final'):
+        assert resultado[coluna] == pytest.approx(historico[coluna].sum(), rel=1e-12)
+    assert resultado['reducao_tCO2e'] == pytest.approx(0, abs=1e-9)
+
+
+def test_cenario_combinado_equivale_ao_pipeline_sobre_viagens_alteradas(viagens, registro):
+    meta, idade_maxima, razao_consumo = 4.0, 10, 1.4
+    cenario = {'fracao_migracao': 1.0, 'idade_maxima': idade_maxima, 'meta_km_por_litro': meta}
+    resultado = simular_cenarios(viagens, [cenario], razao_consumo=razao_consumo, registro=registro).iloc[0]
+
+    # As mesmas alavancas aplicadas viagem a viagem, antes do pipeline
+    alteradas = viagens.copy()
+    abaixo_da_meta = alteradas['KM_Rodado'] / meta < alteradas['Combustivel_L']
+    alteradas.loc[abaixo_da_meta, 'Combustivel_L'] = alteradas['KM_Rodado'] / meta
+    diesel = alteradas['Tipo_Combustivel'] == 'Diesel S10'
+    alteradas.loc[diesel, 'Combustivel_L'] *= razao_consumo
+    alteradas.loc[diesel, 'Tipo_Combustivel'] = 'Etanol'
+    renovadas = ANO_REFERENCIA - alteradas['Ano_Fabricacao'] > idade_maxima
+    alteradas.loc[renovadas, 'Ano_Fabricacao'] = ANO_REFERENCIA
+    esperado = processar_pipeline(alteradas, registro=registro)
+
+    for coluna in ('Combustivel_L', 'emissao_base', 'emissao_final'):
+        assert resultado[coluna] == pytest.approx(esperado[coluna].sum(), rel=1e-12)
+
+
+@pytest.mark.parametrize('particionar_por', ['linhas', 'frota'])
+def test_processamento_paralelo_equivale_ao_serial(viagens, registro, monkeypatch, particionar_por):
+    # Partições pequenas para que mesmo os dados de exemplo passem pelo pool de processos
+    monkeypatch.setattr(carbon_calculator, 'LINHAS_MINIMAS_POR_PROCESSO', 5)
+    esperado = processar_pipeline(viagens.copy(), registro=registro)
+    resultado = processar_em_paralelo(viagens, n_processos=3, particionar_por=particionar_por, registro=registro)
+
+    pd.testing.assert_frame_equal(resultado['dados'], esperado)
+    resumo = resumir_resultados(esperado)
+    assert resultado['viagens'] == resumo['viagens']
+    assert resultado['emissao_base_total'] == resumo['emissao_base_total']
+    assert resultado['emissao_final_total'] == resumo['emissao_final_total']
+    pd.testing.assert_frame_equal(resultado['agregados_frota'], resumo['agregados_frota'])
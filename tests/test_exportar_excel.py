@@ -0,0 +1,94 @@
+"""
+Exportação para Excel com o ExportadorExcel: resumo mensal com datas ausentes ou inválidas,
+divisão das viagens em planilhas e arquivos extras e limpeza dos temporários em caso de erro.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+from openpyxl.worksheet._writer import ALL_TEMP_FILES
+
+from carbon_calculator import processar_em_lotes, processar_pipeline
+from exportar_excel import ExportadorExcel, exportar_excel
+from fatores import obter_registro
+
+ARQUIVO_EXEMPLO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dados_exemplo.csv')
+
+
+@pytest.fixture
+def viagens():
+    return processar_pipeline(pd.read_csv(ARQUIVO_EXEMPLO, encoding='utf-8'), registro=obter_registro(2025))
+
+
+def _temporarios():
+    return [caminho for caminho in ALL_TEMP_FILES if os.path.exists(caminho)]
+
+
+# --- Testes ---
+def test_resumo_mensal_com_datas_ausentes_ou_invalidas(viagens, tmp_path):
+    viagens['Data'] = (['2025-01-15', 'ontem', None, np.nan, '2025-02-01'] * len(viagens))[:len(viagens)]
+    caminho = str(tmp_path / 'relatorio.xlsx')
+    exportar_excel(viagens, caminho)
+
+    resumo = pd.read_excel(caminho, sheet_name='Resumo_Mes', keep_default_na=False)
+    assert resumo['Viagens'].sum() == len(viagens)
+    assert set(resumo['Mes']) == {'', '2025-01', '2025-02'}
+    assert resumo.set_index('Mes').loc['', 'Viagens'] == viagens['Data'].isin(['ontem', None, np.nan]).sum()
+
+
+def test_sem_coluna_data_nao_gera_resumo_mensal(viagens, tmp_path):
+    caminho = str(tmp_path / 'relatorio.xlsx')
+    exportar_excel(viagens.drop(columns='Data'), caminho)
+
+    assert load_workbook(caminho, read_only=True).sheetnames == ['Resumo_Frota', 'Resumo_Combustivel', 'Viagens']
+
+
+def test_viagens_continuam_em_novas_planilhas_e_arquivos(viagens, tmp_path):
+    caminho = str(tmp_path / 'relatorio.xlsx')
+    # 4 linhas por planilha (cabeçalho + 3 viagens) e 2 planilhas de viagens por arquivo
+    with ExportadorExcel(caminho, max_linhas_planilha=4, max_planilhas_por_arquivo=2) as exportador:
+        for inicio in range(0, len(viagens), 7):
+            exportador.adicionar(viagens.iloc[inicio:inicio + 7])
+
+    planilhas = -(-len(viagens) // 3)
+    assert exportador.arquivos == [caminho] + [str(tmp_path / f'relatorio_{n}.xlsx')
+                                               for n in range(2, -(-planilhas // 2) + 1)]
+    lidas = []
+    for arquivo in exportador.arquivos:
+        for nome, planilha in pd.read_excel(arquivo, sheet_name=None).items():
+            if nome.startswith('Viagens'):
+                assert len(planilha) <= 3
+                lidas.append(planilha)
+    assert len(lidas) == planilhas
+    assert pd.concat(lidas)['ID_Viagem'].tolist() == viagens['ID_Viagem'].tolist()
+    assert pd.read_excel(caminho, sheet_name='Resumo_Frota')['Viagens'].sum() == len(viagens)
+    assert _temporarios() == []
+
+
+def test_erro_descarta_temporarios_e_arquivos_parciais(viagens, tmp_path):
+    caminho = str(tmp_path / 'relatorio.xlsx')
+    with pytest.raises(RuntimeError):
+        with ExportadorExcel(caminho, max_linhas_planilha=4, max_planilhas_por_arquivo=1) as exportador:
+            exportador.adicionar(viagens.iloc[:10])
+            raise RuntimeError('falha no meio da exportação')
+
+    assert len(exportador.arquivos) > 2
+    assert os.listdir(tmp_path) == []
+    assert _temporarios() == []
+
+
+def test_processar_em_lotes_descarta_excel_parcial_em_erro(tmp_path):
+    viagens = pd.read_csv(ARQUIVO_EXEMPLO, encoding='utf-8')
+    viagens['Combustivel_L'] = viagens['Combustivel_L'].astype(object)
+    viagens.loc[len(viagens) - 1, 'Combustivel_L'] = 'quatrocentos'
+    entrada = tmp_path / 'viagens.csv'
+    viagens.to_csv(entrada, index=False, encoding='utf-8')
+    saida = tmp_path / 'relatorio.xlsx'
+
+    with pytest.raises(Exception):
+        processar_em_lotes(str(entrada), str(saida), tamanho_lote=10)
+
+    assert not saida.exists()
+    assert _temporarios() == []
@@ -0,0 +1,60 @@
+"""
+Leitura e gravação de viagens nos formatos colunares (Parquet e Arrow IPC/Feather).
+
+Os testes são ignorados quando o 'pyarrow' não está instalado (ver requirements-dev.txt).
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from carbon_calculator import carregar_dados, compactar_tipos, salvar_resultados
+
+pytest.importorskip('pyarrow')
+
+ARQUIVO_EXEMPLO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dados_exemplo.csv')
+
+FORMATOS_COLUNARES = ['parquet', 'arrow', 'feather']
+
+
+@pytest.fixture
+def viagens():
+    return pd.read_csv(ARQUIVO_EXEMPLO, encoding='utf-8')
+
+
+# --- Testes ---
+@pytest.mark.parametrize('formato', FORMATOS_COLUNARES)
+def test_ida_e_volta_preserva_dados_e_tipos(viagens, tmp_path, formato):
+    caminho = tmp_path / f'viagens.{formato}'
+    salvar_resultados(viagens, caminho)
+
+    pd.testing.assert_frame_equal(carregar_dados(caminho), viagens)
+
+
+@pytest.mark.parametrize('formato', FORMATOS_COLUNARES)
+def test_ida_e_volta_preserva_tipos_compactos(viagens, tmp_path, formato):
+    compactas = compactar_tipos(viagens)
+    caminho = tmp_path / f'viagens.{formato}'
+    salvar_resultados(compactas, caminho)
+
+    lidas = carregar_dados(caminho)
+    pd.testing.assert_series_equal(lidas.dtypes, compactas.dtypes)
+    pd.testing.assert_frame_equal(lidas, compactas)
+
+
+@pytest.mark.parametrize('formato', FORMATOS_COLUNARES)
+def test_projecao_de_colunas(viagens, tmp_path, formato):
+    caminho = tmp_path / f'viagens.{formato}'
+    salvar_resultados(viagens, caminho)
+    colunas = ['Frota_ID', 'Combustivel_L']
+
+    lidas = carregar_dados(caminho, colunas=colunas)
+    assert list(lidas.columns) == colunas
+    pd.testing.assert_frame_equal(lidas, viagens[colunas])
+
+
+def test_formato_explicito_ignora_extensao(viagens, tmp_path):
+    caminho = tmp_path / 'viagens.bin'
+    salvar_resultados(viagens, caminho, formato='parquet')
+
+    pd.testing.assert_frame_equal(carregar_dados(caminho, formato='parquet'), viagens)
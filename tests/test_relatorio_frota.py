@@ -0,0 +1,52 @@
+"""
+Agrupamento das viagens em 'montar_resumos': todas as viagens entram em algum relatório,
+inclusive as sem data ou com data inválida.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from carbon_calculator import processar_pipeline
+from fatores import obter_registro
+from relatorio_frota import PERIODO_SEM_DATA, _nomes_arquivos, montar_resumos
+
+ARQUIVO_EXEMPLO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dados_exemplo.csv')
+
+
+def _viagens(datas=None):
+    df = pd.read_csv(ARQUIVO_EXEMPLO, encoding='utf-8')
+    if datas is not None:
+        df['Data'] = datas(len(df))
+    return processar_pipeline(df, registro=obter_registro(2025))
+
+
+# Datas de todas as viagens menos a primeira ausentes, inválidas ou em formato misto
+DATAS = {
+    'originais': None,
+    'quase_todas_ausentes': lambda n: ['2025-01-15'] + [None] * (n - 1),
+    'invalidas': lambda n: ['2025-01-15', 'ontem', '', np.nan] * (n // 4) + ['31/02/2025'] * (n % 4),
+}
+
+
+# --- Testes ---
+@pytest.mark.parametrize('periodo', ['mes', 'ano', None])
+@pytest.mark.parametrize('datas', list(DATAS))
+def test_todas_as_viagens_entram_nos_resumos(datas, periodo):
+    df = _viagens(DATAS[datas])
+    resumos = montar_resumos(df, periodo=periodo)
+
+    assert sum(resumo['totais']['Viagens'] for resumo in resumos) == len(df)
+    assert sum(len(resumo['viagens']) for resumo in resumos) == len(df)
+    assert sum(viagens for resumo in resumos for _, viagens, _, _ in resumo['combustiveis']) == len(df)
+    assert sum(resumo['totais']['emissao_final'] for resumo in resumos) == pytest.approx(df['emissao_final'].sum())
+
+
+def test_viagens_sem_data_ficam_no_periodo_sem_data():
+    df = _viagens(DATAS['quase_todas_ausentes'])
+    resumos = montar_resumos(df, periodo='mes')
+
+    sem_data = [resumo for resumo in resumos if resumo['periodo'] == PERIODO_SEM_DATA]
+    assert sum(resumo['totais']['Viagens'] for resumo in sem_data) == len(df) - 1
+    assert all(nome.endswith('_sem-data.pdf') for nome in _nomes_arquivos(sem_data))